@@ -0,0 +1 @@
+"""Benchmarks for newBaldy hot paths. Run modules with `python -m benchmarks.<name>`."""
@@ -0,0 +1,78 @@
+"""Compare the old two-pass download_song against the single-pass version.
+
+Needs network access. Each URL is downloaded into a temporary folder with
+both strategies, alternating, and the per-download latency is printed as JSON:
+
+    python -m benchmarks.download_pass https://www.youtube.com/watch?v=... [--rounds 3]
+"""
+import argparse
+import json
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import yt_dlp
+
+from utils.downloader import download_song_sync
+
+
+def _two_pass_download(url: str, folder: Path, max_song_time: int) -> dict:
+    # The pre-single-pass implementation, kept here only for comparison.
+    ydl_opts = {
+        "format": "bestaudio/best",
+        "outtmpl": str(folder / "%(id)s.%(ext)s"),
+        "noplaylist": True,
+        "quiet": True,
+        "no_warnings": True,
+        "youtube_include_dash_manifest": False,
+        "ignoreerrors": True,
+    }
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        info_dict = ydl.extract_info(url, download=False)
+        duration = info_dict.get("duration", 0)
+        if duration and duration > max_song_time:
+            return {"error": "duration", "duration": duration, "max": max_song_time}
+        return {"info": ydl.extract_info(url, download=True)}
+
+
+def _time(fn, url: str, max_song_time: int) -> float:
+    folder = Path(tempfile.mkdtemp(prefix="baldy-bench-"))
+    try:
+        started = time.perf_counter()
+        fn(url, folder, max_song_time)
+        return time.perf_counter() - started
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("urls", nargs="+")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--max-song-time", type=int, default=600)
+    args = parser.parse_args(argv)
+
+    results = []
+    for url in args.urls:
+        two_pass, single_pass = [], []
+        for _ in range(args.rounds):
+            two_pass.append(_time(_two_pass_download, url, args.max_song_time))
+            single_pass.append(_time(download_song_sync, url, args.max_song_time))
+        results.append({
+            "url": url,
+            "two_pass_median_s": statistics.median(two_pass),
+            "single_pass_median_s": statistics.median(single_pass),
+            "saved_median_s": statistics.median(two_pass) - statistics.median(single_pass),
+            "two_pass_s": two_pass,
+            "single_pass_s": single_pass,
+        })
+    json.dump({"benchmark": "download_pass", "results": results}, sys.stdout, indent=2)
+    print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
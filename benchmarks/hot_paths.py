@@ -0,0 +1,205 @@
+"""Time library, scan and queue hot paths against synthetic libraries.
+
+Runs offline: libraries and download folders are generated in a temporary
+directory and metadata lookups go through a fake resolver instead of
+yt_dlp or the YouTube API. Results are printed as JSON; pass --compare with
+an earlier result file to flag regressions (exit code 1 if any):
+
+    python -m benchmarks.hot_paths --sizes 1000 10000 > before.json
+    python -m benchmarks.hot_paths --sizes 1000 10000 --compare before.json
+"""
+import argparse
+import asyncio
+import json
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from utils import guild_state
+from utils.guild_state import QueueEntry
+from utils.library import (
+    LibraryStore,
+    get_library_store,
+    load_library,
+    save_library,
+    scan_and_update_library,
+)
+from utils.metadata import MetadataResolver
+
+_WORDS = (
+    "love night dance remix live acoustic summer heart fire rain dream blue "
+    "city lights feat official video radio edit girl boy world time baby "
+    "home road star moon gold wild young forever lost high down run"
+).split()
+_QUERIES = ("love remix", "summer night", "official video", "blue moon", "zzzz no match")
+
+
+class FakeResolver(MetadataResolver):
+    """MetadataResolver that makes records up instead of calling yt_dlp."""
+
+    def __init__(self, workers: int = 4):
+        super().__init__(workers=workers, rate_limit=1e9, youtube_api_key=None)
+
+    def resolve(self, song_id: str, filename: str, download_folder: str) -> Optional[Dict[str, Any]]:
+        rng = random.Random(song_id)
+        info = {
+            "title": " ".join(rng.choices(_WORDS, k=4)),
+            "duration": rng.randint(90, 600),
+            "uploader": " ".join(rng.choices(_WORDS, k=2)),
+        }
+        return self._record(song_id, filename, download_folder, info)
+
+
+def _video_id(i: int) -> str:
+    return f"v{i:010d}"
+
+
+def make_library(size: int, download_folder: str = "downloads") -> Dict[str, Dict[str, Any]]:
+    resolver = FakeResolver()
+    return {
+        _video_id(i): resolver.resolve(_video_id(i), f"{_video_id(i)}.webm", download_folder)
+        for i in range(size)
+    }
+
+
+def make_download_folder(folder: Path, size: int) -> None:
+    folder.mkdir(parents=True, exist_ok=True)
+    for i in range(size):
+        (folder / f"{_video_id(i)}.webm").touch()
+
+
+def _measure(fn: Callable[[], Any], repeat: int, setup: Optional[Callable[[], Any]] = None) -> Dict[str, float]:
+    samples = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return {"median_s": statistics.median(samples), "min_s": min(samples)}
+
+
+def _queue_ops(size: int) -> None:
+    guilds = 100
+    for guild_id in range(guilds):
+        queue = guild_state.get_queue(guild_id)
+        for i in range(size // guilds):
+            queue.append(QueueEntry("title", "url", _video_id(i)))
+    for guild_id in range(0, guilds, 2):
+        guild_state.get_queue(guild_id).shuffle()
+    asyncio.run(guild_state.remove_song_everywhere(_video_id(0)))
+    for guild_id in range(guilds):
+        queue = guild_state.get_queue(guild_id)
+        while queue:
+            queue.popleft()
+
+
+def bench_size(size: int, backend: str, repeat: int, workers: int) -> Dict[str, Dict[str, float]]:
+    root = Path(tempfile.mkdtemp(prefix="baldy-bench-"))
+    try:
+        library = make_library(size)
+        library_path = root / "index" / "song_library.json"
+        library_path.parent.mkdir()
+        download_folder_path = root / "downloads"
+        make_download_folder(download_folder_path, size)
+        save_library(library, library_path)
+
+        results: Dict[str, Dict[str, float]] = {}
+        results["load_library"] = _measure(lambda: load_library(library_path), repeat)
+        results["save_library"] = _measure(lambda: save_library(library, library_path), repeat)
+        results["open_store"] = _measure(lambda: len(LibraryStore(library_path)), repeat)
+
+        store = get_library_store(library_path, backend)
+        len(store)
+        rng = random.Random(size)
+        results["play_library_lookup"] = _measure(
+            lambda: [store.search(q, limit=1) for q in _QUERIES], repeat
+        )
+        results["library_search"] = _measure(
+            lambda: [store.search(q, limit=20) for q in _QUERIES], repeat
+        )
+        results["library_head"] = _measure(lambda: store.head(20), repeat)
+        results["shuffle_sample"] = _measure(lambda: store.sample(10), repeat)
+        results["put"] = _measure(
+            lambda: store.put(_video_id(rng.randrange(size)), library[_video_id(0)]), repeat
+        )
+
+        resolver = FakeResolver(workers)
+
+        def _reset_library() -> None:
+            for song_id in [_video_id(i) for i in range(0, size, 10)]:
+                store.remove(song_id)
+
+        results["scan_full"] = _measure(
+            lambda: scan_and_update_library(
+                download_folder_path, library_path, "downloads", full=True, resolver=resolver,
+            ),
+            repeat,
+            setup=_reset_library,
+        )
+        results["scan_incremental"] = _measure(
+            lambda: scan_and_update_library(
+                download_folder_path, library_path, "downloads", resolver=resolver,
+            ),
+            repeat,
+        )
+        results["queue_ops"] = _measure(lambda: _queue_ops(size), repeat)
+        return results
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    """Return the operations whose median got slower than baseline by more than threshold."""
+    regressions = []
+    for size, ops in current["results"].items():
+        for op, timing in ops.items():
+            before = baseline.get("results", {}).get(size, {}).get(op)
+            if not before or not before["median_s"]:
+                continue
+            ratio = timing["median_s"] / before["median_s"]
+            if ratio > 1 + threshold:
+                regressions.append({
+                    "size": size,
+                    "op": op,
+                    "baseline_s": before["median_s"],
+                    "current_s": timing["median_s"],
+                    "ratio": ratio,
+                })
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--backend", choices=("json", "sqlite"), default="json")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=4, help="fake resolver threads for the scan")
+    parser.add_argument("--compare", type=Path, default=None, help="earlier JSON output to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown before flagging, 0.2 = 20%%")
+    args = parser.parse_args(argv)
+
+    output: Dict[str, Any] = {
+        "benchmark": "hot_paths",
+        "backend": args.backend,
+        "repeat": args.repeat,
+        "results": {str(size): bench_size(size, args.backend, args.repeat, args.workers) for size in args.sizes},
+    }
+    status = 0
+    if args.compare is not None:
+        with args.compare.open("r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        output["regressions"] = compare(output, baseline, args.threshold)
+        status = 1 if output["regressions"] else 0
+    json.dump(output, sys.stdout, indent=2)
+    print()
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
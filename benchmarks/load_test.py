@@ -0,0 +1,366 @@
+"""Drive MusicCog with hundreds of simulated guilds, no Discord connection needed.
+
+Context, text/voice channels and VoiceClient are fakes; downloads go
+through the real DownloadScheduler with fetch_and_index stubbed, and both
+search providers are stubbed with a fixed latency. Each guild runs a random
+mix of !play (library hits and new songs), !skip, !shuffle, !queue and
+!stop while tracks "play" for --track-seconds. Reports event loop lag,
+command latency percentiles and guild lock contention as JSON:
+
+    python -m benchmarks.load_test --guilds 300 --commands 20
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import random
+import shutil
+import sys
+import tempfile
+import time
+import zlib
+from collections import defaultdict
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+from unittest import mock
+
+import discord
+
+import cogs.music as music
+import utils.scheduler as scheduler
+from benchmarks.hot_paths import make_download_folder, make_library
+from cogs.music import MusicCog
+from utils import guild_state
+from utils.file_index import get_file_index
+from utils.library import save_library, update_song_library
+from utils.search_race import PROVIDER_API, PROVIDER_YTSEARCH
+
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {"count": 0}
+    values = sorted(samples)
+
+    def pick(q: float) -> float:
+        return values[min(len(values) - 1, int(q * len(values)))]
+
+    return {
+        "count": len(values),
+        "p50_s": pick(0.5),
+        "p95_s": pick(0.95),
+        "p99_s": pick(0.99),
+        "max_s": values[-1],
+    }
+
+
+class FakeSource(discord.AudioSource):
+    def __init__(self, path: str, frames: int = 50):
+        self.path = path
+        self._frames = frames
+
+    def read(self) -> bytes:
+        if self._frames <= 0:
+            return b""
+        self._frames -= 1
+        return b"\xf8\xff\xfe"
+
+    def is_opus(self) -> bool:
+        return True
+
+    def cleanup(self) -> None:
+        self._frames = 0
+
+
+async def fake_create_audio_source(source: str, mode: str = "opus", **kwargs) -> discord.AudioSource:
+    return FakeSource(source)
+
+
+class FakeVoiceClient:
+    """Plays a source for track_seconds, then calls after() like discord.py's player."""
+
+    def __init__(self, channel: "FakeVoiceChannel", track_seconds: float):
+        self.channel = channel
+        self.track_seconds = track_seconds
+        self._connected = True
+        self._handle: Optional[asyncio.TimerHandle] = None
+        self._after = None
+        self.plays = 0
+
+    def is_connected(self) -> bool:
+        return self._connected
+
+    def is_playing(self) -> bool:
+        return self._handle is not None
+
+    def play(self, source: discord.AudioSource, *, after=None) -> None:
+        if self._handle is not None:
+            raise discord.ClientException("Already playing audio.")
+        source.read()
+        self.plays += 1
+        self._after = after
+        self._handle = asyncio.get_running_loop().call_later(self.track_seconds, self._finish)
+
+    def _finish(self) -> None:
+        self._handle = None
+        after, self._after = self._after, None
+        if after is not None:
+            after(None)
+
+    def stop(self) -> None:
+        if self._handle is not None:
+            self._handle.cancel()
+            self._finish()
+
+    async def move_to(self, channel: "FakeVoiceChannel") -> None:
+        self.channel = channel
+
+    async def disconnect(self, *, force: bool = False) -> None:
+        self.stop()
+        self._connected = False
+
+
+class FakeVoiceChannel:
+    def __init__(self, harness: "Harness"):
+        self.harness = harness
+
+    async def connect(self) -> FakeVoiceClient:
+        await asyncio.sleep(self.harness.args.connect_seconds)
+        self.harness.connects += 1
+        return FakeVoiceClient(self, self.harness.args.track_seconds)
+
+
+class FakeTextChannel:
+    def __init__(self, channel_id: int, harness: "Harness"):
+        self.id = channel_id
+        self.harness = harness
+
+    async def send(self, content: Optional[str] = None, **kwargs) -> None:
+        self.harness.messages += 1
+        if content and content.startswith(("Error", "Failed", "Download error")):
+            self.harness.errors.append(content)
+
+
+class FakeContext:
+    def __init__(self, guild_id: int, harness: "Harness"):
+        self.guild = SimpleNamespace(id=guild_id)
+        self.channel = harness.text_channel(guild_id)
+        self.author = SimpleNamespace(voice=SimpleNamespace(channel=FakeVoiceChannel(harness)))
+
+    async def send(self, content: Optional[str] = None, **kwargs) -> None:
+        await self.channel.send(content, **kwargs)
+
+
+class TimedLock:
+    """Wraps a guild lock and records how long acquiring it took."""
+
+    def __init__(self, lock: asyncio.Lock, harness: "Harness"):
+        self._lock = lock
+        self._harness = harness
+
+    def locked(self) -> bool:
+        return self._lock.locked()
+
+    async def __aenter__(self) -> None:
+        contended = self._lock.locked()
+        started = time.perf_counter()
+        await self._lock.acquire()
+        self._harness.lock_waits.append(time.perf_counter() - started)
+        if contended:
+            self._harness.lock_contended += 1
+
+    async def __aexit__(self, *exc) -> None:
+        self._lock.release()
+
+
+class Harness:
+    def __init__(self, args: argparse.Namespace, root: Path):
+        self.args = args
+        self.root = root
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.loop_lag: List[float] = []
+        self.lock_waits: List[float] = []
+        self.lock_contended = 0
+        self.connects = 0
+        self.messages = 0
+        self.errors: List[str] = []
+        self._text_channels: Dict[int, FakeTextChannel] = {}
+        self.download_folder_path = root / "downloads"
+        self.library_path = root / "index" / "song_library.json"
+
+    def text_channel(self, channel_id: int) -> FakeTextChannel:
+        channel = self._text_channels.get(channel_id)
+        if channel is None:
+            channel = self._text_channels[channel_id] = FakeTextChannel(channel_id, self)
+        return channel
+
+    def setup(self) -> MusicCog:
+        self.library_path.parent.mkdir(parents=True)
+        library = make_library(self.args.library_size)
+        save_library(library, self.library_path)
+        make_download_folder(self.download_folder_path, self.args.library_size)
+        get_file_index(self.download_folder_path).rebuild()
+        self.titles = [record["title"] for record in library.values()]
+
+        config = SimpleNamespace(
+            youtube_api_key="load-test",
+            max_song_time=600,
+            download_workers=self.args.download_workers,
+            prefetch_depth=3,
+            stream_while_downloading=False,
+            audio_mode="opus",
+            transcode_workers=0,
+            search_cache_ttl=300,
+            search_cache_size=1000,
+            search_cache_persist=False,
+            search_mode="hedge",
+            search_hedge_delay=self.args.search_seconds * 2,
+            file_index_watch=False,
+            file_index_verify_interval=0,
+            guild_idle_ttl=0,
+            max_guilds=0,
+            voice_linger=self.args.linger_seconds,
+        )
+        bot = SimpleNamespace(loop=asyncio.get_running_loop(), get_channel=self.text_channel)
+        cog = MusicCog(bot, config, self.download_folder_path, self.library_path, "downloads")
+        cog.search_racer.providers = {
+            PROVIDER_API: self._fake_search,
+            PROVIDER_YTSEARCH: self._fake_search,
+        }
+        return cog
+
+    def patched(self) -> contextlib.ExitStack:
+        """Swap FFmpeg, downloads and guild locks for fakes; the originals come back on exit."""
+        stack = contextlib.ExitStack()
+        stack.enter_context(mock.patch.object(music, "create_audio_source", fake_create_audio_source))
+        stack.enter_context(mock.patch.object(scheduler, "fetch_and_index", self._fake_fetch_and_index))
+        real_get_guild_lock = guild_state.get_guild_lock
+        stack.enter_context(mock.patch.object(
+            guild_state, "get_guild_lock", lambda guild_id: TimedLock(real_get_guild_lock(guild_id), self)
+        ))
+        return stack
+
+    def _fake_search(self, query: str) -> List[Dict[str, Any]]:
+        time.sleep(self.args.search_seconds)
+        video_id = f"n{zlib.crc32(query.encode()):010d}"
+        return [{"title": query, "videoId": video_id, "author": "Load Test"}]
+
+    async def _fake_fetch_and_index(self, url, download_folder_path, max_song_time, library_path,
+                                    download_folder, executor=None, resolved_info=None):
+        video_id = url.rsplit("=", 1)[-1]
+        await asyncio.sleep(self.args.download_seconds)
+        path = download_folder_path / f"{video_id}.webm"
+        path.touch()
+        await asyncio.to_thread(
+            update_song_library, {"id": video_id, "title": video_id}, library_path, download_folder
+        )
+        get_file_index(download_folder_path).refresh(video_id)
+        return {"file": str(path), "id": video_id}
+
+    async def _timed(self, name: str, coro) -> None:
+        started = time.perf_counter()
+        try:
+            await coro
+        except Exception as e:
+            self.errors.append(f"{name}: {e!r}")
+        self.latencies[name].append(time.perf_counter() - started)
+
+    async def _monitor_loop(self, interval: float = 0.05) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + interval
+            await asyncio.sleep(interval)
+            self.loop_lag.append(max(0.0, loop.time() - expected))
+
+    async def _guild_session(self, cog: MusicCog, guild_id: int) -> None:
+        rng = random.Random(self.args.seed * 100003 + guild_id)
+        ctx = FakeContext(guild_id, self)
+        await asyncio.sleep(rng.uniform(0, self.args.ramp_seconds))
+        for _ in range(self.args.commands):
+            roll = rng.random()
+            if roll < 0.55:
+                if rng.random() < self.args.library_hit_rate:
+                    query = rng.choice(self.titles)
+                else:
+                    query = f"load test song {rng.randrange(self.args.unique_songs)}"
+                await self._timed("play", MusicCog.play.callback(cog, ctx, song_name=query))
+            elif roll < 0.70:
+                await self._timed("skip", MusicCog.skip.callback(cog, ctx))
+            elif roll < 0.80:
+                await self._timed("shuffle", MusicCog.shuffle.callback(cog, ctx))
+            elif roll < 0.95:
+                await self._timed("queue", MusicCog.show_queue.callback(cog, ctx))
+            else:
+                await self._timed("stop", MusicCog.stop.callback(cog, ctx))
+            await asyncio.sleep(rng.expovariate(1 / self.args.think_seconds))
+        await self._timed("stop", MusicCog.stop.callback(cog, ctx))
+
+    async def run(self) -> Dict[str, Any]:
+        with self.patched():
+            cog = self.setup()
+            await cog.cog_load()
+            monitor = asyncio.create_task(self._monitor_loop())
+            started = time.perf_counter()
+            try:
+                await asyncio.gather(*(self._guild_session(cog, guild_id) for guild_id in range(self.args.guilds)))
+            finally:
+                elapsed = time.perf_counter() - started
+                monitor.cancel()
+                await cog.cog_unload()
+        return {
+            "benchmark": "load_test",
+            "guilds": self.args.guilds,
+            "commands_per_guild": self.args.commands,
+            "elapsed_s": elapsed,
+            "commands": {name: _percentiles(samples) for name, samples in sorted(self.latencies.items())},
+            "loop_lag": _percentiles(self.loop_lag),
+            "guild_locks": {
+                "acquisitions": len(self.lock_waits),
+                "contended": self.lock_contended,
+                "wait": _percentiles(self.lock_waits),
+            },
+            "downloads": cog.downloads.stats(),
+            "search": cog.search_racer.stats(),
+            "guild_state": guild_state.manager.stats(),
+            "voice_connects": self.connects,
+            "voice_reuses": cog.voice_reuses,
+            "first_audio": cog.playback_stats.summary(),
+            "track_gaps": cog.gap_stats.summary(),
+            "messages_sent": self.messages,
+            "errors": len(self.errors),
+            "error_samples": self.errors[:10],
+        }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--guilds", type=int, default=300)
+    parser.add_argument("--commands", type=int, default=20, help="commands per guild")
+    parser.add_argument("--library-size", type=int, default=5000)
+    parser.add_argument("--library-hit-rate", type=float, default=0.7)
+    parser.add_argument("--unique-songs", type=int, default=500, help="distinct songs that miss the library")
+    parser.add_argument("--track-seconds", type=float, default=2.0)
+    parser.add_argument("--think-seconds", type=float, default=0.5)
+    parser.add_argument("--ramp-seconds", type=float, default=2.0)
+    parser.add_argument("--search-seconds", type=float, default=0.2)
+    parser.add_argument("--download-seconds", type=float, default=0.5)
+    parser.add_argument("--download-workers", type=int, default=4)
+    parser.add_argument("--connect-seconds", type=float, default=0.3)
+    parser.add_argument("--linger-seconds", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    root = Path(tempfile.mkdtemp(prefix="baldy-load-"))
+    try:
+        report = asyncio.run(Harness(args, root).run())
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    json.dump(report, sys.stdout, indent=2)
+    print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+"""CPU cost per stream of the PCM (transcode) and Opus passthrough playback paths.
+
+Needs ffmpeg/ffprobe and libopus. Each file is read to the end as fast as
+possible through the same AudioSource classes the bot uses; for the PCM path
+every frame is also Opus-encoded in-process like discord.py's player does.
+CPU time of this process and of the FFmpeg children is reported as JSON:
+
+    python -m benchmarks.playback_cpu downloads/abc.webm downloads/def.m4a
+"""
+import argparse
+import asyncio
+import json
+import resource
+import sys
+import time
+
+import discord
+from discord import opus
+
+from utils.playback import create_audio_source
+
+FRAME_SECONDS = opus.Encoder.FRAME_LENGTH / 1000
+
+
+def _children_cpu() -> float:
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _drain(source: discord.AudioSource, encoder) -> dict:
+    cpu_self, cpu_children, wall = time.process_time(), _children_cpu(), time.perf_counter()
+    frames = 0
+    try:
+        while True:
+            data = source.read()
+            if not data:
+                break
+            if encoder is not None:
+                encoder.encode(data, opus.Encoder.SAMPLES_PER_FRAME)
+            frames += 1
+    finally:
+        source.cleanup()
+    audio_seconds = frames * FRAME_SECONDS
+    self_s = time.process_time() - cpu_self
+    children_s = _children_cpu() - cpu_children
+    return {
+        "audio_seconds": audio_seconds,
+        "wall_s": time.perf_counter() - wall,
+        "bot_cpu_s": self_s,
+        "ffmpeg_cpu_s": children_s,
+        "cpu_s_per_audio_minute": (self_s + children_s) / audio_seconds * 60 if audio_seconds else 0.0,
+    }
+
+
+async def _bench(path: str) -> dict:
+    encoder = opus.Encoder()
+    pcm = _drain(await create_audio_source(path, "pcm"), encoder)
+    source = await create_audio_source(path, "opus")
+    passthrough = _drain(source, None)
+    return {"file": path, "pcm": pcm, "opus": passthrough}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--libopus", default="/usr/lib/libopus.so.0", help="path to libopus (same default as the bot)")
+    args = parser.parse_args(argv)
+
+    if not opus.is_loaded():
+        opus.load_opus(args.libopus)
+
+    results = [asyncio.run(_bench(path)) for path in args.files]
+    json.dump({"benchmark": "playback_cpu", "results": results}, sys.stdout, indent=2)
+    print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,17 @@
+import asyncio
 import logging
 import re
 from pathlib import Path
 import discord
 from discord.ext import commands
 from configManager import ConfigManager
-from utils import guild_state
-from utils.library import load_library, save_library
+from utils import guild_state, profiling, tracing
+from utils.library import get_library_store, scan_and_update_library
 from utils.downloader import get_song_file_path
+from utils.file_index import get_file_index
+from utils.metadata import MetadataResolver
+from utils.transcode import NORMALIZED_FOLDER
+from utils.youtube_api import get_youtube_client
 
 logger = logging.getLogger("newBaldy.admin")
 
@@ -27,6 +32,7 @@ class AdminCog(commands.Cog, name="Admin"):
         self.config_manager = config_manager
         self.download_folder_path = download_folder_path
         self.library_path = library_path
+        self.song_library = get_library_store(library_path)
 
     async def cog_check(self, ctx: commands.Context) -> bool:
         if ctx.author.id != self.config_manager.bot_owner:
@@ -45,6 +51,82 @@ class AdminCog(commands.Cog, name="Admin"):
                 logger.exception("Error disconnecting VC during shutdown for guild %s", gid)
         await self.bot.close()
 
+    @commands.command(name="rescan")
+    async def rescan(self, ctx: commands.Context, mode: str = ""):
+        """Rescans the download folder; `!rescan full` re-checks every file. (owner only)"""
+        full = mode.lower() == "full"
+        await ctx.send(f"Running {'full' if full else 'incremental'} library scan...")
+        result = await asyncio.to_thread(
+            scan_and_update_library,
+            self.download_folder_path,
+            self.library_path,
+            self.config_manager.download_folder,
+            full,
+            MetadataResolver(
+                self.config_manager.scan_workers,
+                self.config_manager.scan_rate_limit,
+                self.config_manager.youtube_api_key,
+            ),
+        )
+        if result is None:
+            await ctx.send("Scan did not run: another scan is in progress or it failed, check the logs.")
+            return
+        await ctx.send(f"Library scan complete: {result.summary()}")
+
+    @commands.command(name="quota")
+    async def quota(self, ctx: commands.Context):
+        """Shows YouTube API quota spent today, per command. (owner only)"""
+        stats = get_youtube_client(self.config_manager.youtube_api_key).ledger.stats()
+        lines = "\n".join(
+            f"• {label}: {units}" for label, units in
+            sorted(stats["by_command"].items(), key=lambda item: -item[1])
+        ) or "• nothing spent yet"
+        await ctx.send(
+            f"**YouTube API quota for {stats['day']}:** {stats['spent']}/{stats['limit']} units "
+            f"({stats['remaining']} left)\n{lines}"
+        )
+
+    @commands.command(name="traces")
+    async def traces(self, ctx: commands.Context, count: int = 3):
+        """Shows the slowest recent !play traces, stage by stage. (owner only)"""
+        slowest = tracing.tracer.slowest(max(1, min(count, 10)))
+        if not slowest:
+            await ctx.send("No traces recorded yet.")
+            return
+        for summary in slowest:
+            attrs = summary["attrs"]
+            header = (
+                f"**{summary['name']}** `{attrs.get('query', '')}` {summary['duration_s']:.2f}s "
+                f"(trace `{summary['trace_id']}`)"
+            )
+            await ctx.send(f"{header}\n```\n{tracing.format_trace(summary)[:1800]}\n```")
+
+    @commands.command(name="profile")
+    async def profile(self, ctx: commands.Context, kind: str = "cpu", seconds: float = 10, top: int = 15):
+        """Profiles the bot for N seconds: `!profile cpu|mem [seconds] [top]`. (owner only)"""
+        kind = kind.lower()
+        if kind not in ("cpu", "mem"):
+            await ctx.send("Usage: `!profile cpu|mem [seconds] [top]`")
+            return
+        if profiling.is_running():
+            await ctx.send("A profile is already running, try again when it finishes.")
+            return
+        seconds = max(1.0, min(seconds, profiling.MAX_SECONDS))
+        top = max(1, min(top, 30))
+        folder = self.library_path.parent / "profiles"
+        await ctx.send(f"Profiling {'CPU' if kind == 'cpu' else 'memory'} for {seconds:.0f}s...")
+        try:
+            if kind == "cpu":
+                lines, report = await profiling.profile_cpu(seconds, folder, top)
+            else:
+                lines, report = await profiling.profile_memory(seconds, folder, top)
+        except Exception as e:
+            logger.exception("Profiling failed")
+            await ctx.send(f"Profiling failed: {e}")
+            return
+        summary = "\n".join(lines)[:1800]
+        await ctx.send(f"```\n{summary}\n```Full report: `{report}`")
+
     @commands.command(name="remove")
     async def remove_song(self, ctx: commands.Context, video_id: str):
         """Removes a song from the library and download folder by video ID. (owner only)"""
@@ -52,18 +134,19 @@ class AdminCog(commands.Cog, name="Admin"):
             await ctx.send("Invalid video ID format.")
             return
         try:
-            library = load_library(self.library_path)
-            if video_id not in library:
+            removed = self.song_library.remove(video_id)
+            if removed is None:
                 await ctx.send(f"No song found with ID: `{video_id}`")
                 return
 
-            song_title = library[video_id]["title"]
-            del library[video_id]
-            save_library(library, self.library_path)
+            song_title = removed["title"]
+            normalized = self.download_folder_path / NORMALIZED_FOLDER / f"{video_id}.ogg"
+            normalized.unlink(missing_ok=True)
 
             file_path_str = get_song_file_path(video_id, self.download_folder_path)
             if file_path_str:
-                Path(file_path_str).unlink()
+                Path(file_path_str).unlink(missing_ok=True)
+                get_file_index(self.download_folder_path).refresh(video_id)
                 await ctx.send(f"Removed **{song_title}** from the library and deleted the file.")
             else:
                 await ctx.send(
@@ -71,11 +154,7 @@ class AdminCog(commands.Cog, name="Admin"):
                     f"but the file was not found in the downloads folder."
                 )
 
-            for gid in guild_state.guild_queues:
-                guild_state.guild_queues[gid] = [
-                    song for song in guild_state.guild_queues[gid]
-                    if song.get("id") != video_id
-                ]
+            await guild_state.remove_song_everywhere(video_id)
 
         except Exception as e:
             logger.exception("Error removing song %s: %s", video_id, e)
@@ -1,14 +1,40 @@
 import logging
-import random
+import time
+from contextlib import nullcontext
+from functools import partial
 from pathlib import Path
-from typing import Optional
+from typing import Dict, Optional, Set, Tuple
 import asyncio
 import discord
 from discord.ext import commands
 from configManager import ConfigManager
-from utils import guild_state
-from utils.library import load_library
-from utils.downloader import download_song, search_song, get_song_file_path
+from utils import guild_state, tracing
+from utils.guild_state import QueueEntry
+from utils.file_index import get_file_index
+from utils.library import get_library_store
+from utils.metrics import registry as metrics
+from utils.downloader import (
+    download_error_message,
+    get_song_file_path,
+    resolve_song_sync,
+)
+from utils.playback import (
+    FirstAudioTimer,
+    PlaybackStats,
+    PrimedSource,
+    create_audio_source,
+    stream_before_options,
+)
+from utils.search_cache import SearchCache
+from utils.search_race import PROVIDER_YTSEARCH, SearchRacer
+from utils.transcode import Transcoder
+from utils.youtube_api import quota_label
+from utils.scheduler import (
+    DownloadScheduler,
+    PRIORITY_NOW,
+    PRIORITY_REQUEST,
+    log_background_result,
+)
 
 logger = logging.getLogger("newBaldy.music")
 
@@ -27,14 +53,165 @@ class MusicCog(commands.Cog, name="Music"):
         self.download_folder_path = download_folder_path
         self.library_path = library_path
         self.download_folder = download_folder
+        self.song_library = get_library_store(library_path)
+        self.downloads = DownloadScheduler(
+            download_folder_path,
+            config_manager.max_song_time,
+            library_path,
+            download_folder,
+            workers=config_manager.download_workers,
+            prefetch_depth=config_manager.prefetch_depth,
+        )
+        self.playback_stats = PlaybackStats()
+        self.gap_stats = PlaybackStats()
+        # guild -> (queue entry, primed source) for the song after the current one.
+        self._prepared: Dict[int, Tuple[QueueEntry, PrimedSource]] = {}
+        self._track_ended: Dict[int, float] = {}
+        # Idle voice connections waiting out VOICE_LINGER before disconnecting.
+        self._linger_tasks: Dict[int, asyncio.Task] = {}
+        # Songs fetched on demand because their file was missing when they came up.
+        self._download_waits: Dict[int, Set[asyncio.Task]] = {}
+        # play_next runs started from the audio thread when a track ends.
+        self._transitions: Dict[int, Set[asyncio.Task]] = {}
+        # How the current voice session started: "connect" or "linger" (reused).
+        self._voice_mode: Dict[int, str] = {}
+        self.voice_connects = 0
+        self.voice_reuses = 0
+        self.voice_stats = PlaybackStats()
+        self.transcoder = Transcoder(
+            download_folder_path,
+            library_path,
+            download_folder,
+            workers=config_manager.transcode_workers,
+        )
+        self.downloads.add_listener(self.transcoder.submit)
+        self.search_cache = SearchCache(
+            ttl=config_manager.search_cache_ttl,
+            max_entries=config_manager.search_cache_size,
+            path=library_path.parent / "search_cache.json" if config_manager.search_cache_persist else None,
+        )
+        self.search_racer = SearchRacer(
+            config_manager.youtube_api_key,
+            mode=config_manager.search_mode,
+            hedge_delay=config_manager.search_hedge_delay,
+            cache=self.search_cache,
+        )
+        self._cache_saver: Optional[asyncio.Task] = None
+        self._index_verifier: Optional[asyncio.Task] = None
+        self._guild_evictor: Optional[asyncio.Task] = None
+        self._register_metrics()
+
+    def _register_metrics(self) -> None:
+        metrics.callback(
+            "baldy_search_cache_lookups_total", "Search cache lookups by result.",
+            lambda: {("hit",): self.search_cache.hits, ("miss",): self.search_cache.misses},
+            kind="counter", labelnames=("result",),
+        )
+        metrics.callback("baldy_library_songs", "Songs in the library.", lambda: len(self.song_library))
+        metrics.callback(
+            "baldy_voice_clients_connected", "Connected voice clients.",
+            lambda: sum(1 for vc in guild_state.guild_voice_clients.values() if vc.is_connected()),
+        )
+        metrics.callback(
+            "baldy_queue_depth", "Songs queued per guild (guilds with an empty queue are omitted).",
+            lambda: {(str(gid),): len(q) for gid, q in guild_state.guild_queues.items() if q},
+            labelnames=("guild",),
+        )
+        metrics.callback(
+            "baldy_download_jobs", "Download jobs by state.",
+            lambda: {(k,): self.downloads.stats()[k] for k in ("running", "queued")},
+            labelnames=("state",),
+        )
+        metrics.callback(
+            "baldy_download_executor_threads", "Download thread pool threads and queued work items.",
+            lambda: {(k,): v for k, v in self.downloads.stats()["executor"].items()},
+            labelnames=("state",),
+        )
+
+    async def cog_load(self) -> None:
+        guild_state.manager.add_listener(self._forget_guild)
+        self.downloads.start()
+        self.search_cache.load()
+        self._cache_saver = asyncio.create_task(self._save_search_cache_periodically())
+        if self.config_manager.file_index_watch:
+            get_file_index(self.download_folder_path).watch()
+        if self.config_manager.file_index_verify_interval > 0:
+            self._index_verifier = asyncio.create_task(
+                self._verify_file_index_periodically(self.config_manager.file_index_verify_interval)
+            )
+        if self.config_manager.guild_idle_ttl > 0 or self.config_manager.max_guilds > 0:
+            self._guild_evictor = asyncio.create_task(
+                self._evict_idle_guilds_periodically(min(60, self.config_manager.guild_idle_ttl or 60))
+            )
+
+    async def cog_unload(self) -> None:
+        guild_state.manager.remove_listener(self._forget_guild)
+        for task in (self._cache_saver, self._index_verifier, self._guild_evictor):
+            if task is not None:
+                task.cancel()
+        for guild_id in list(self._prepared):
+            self._discard_prepared(guild_id)
+        for guild_id in list(self._linger_tasks):
+            self._cancel_linger(guild_id)
+        for tasks in (self._download_waits, self._transitions):
+            for guild_id in list(tasks):
+                self._cancel_tasks(tasks, guild_id)
+        self.search_cache.save()
+        await self.downloads.stop()
+        await self.transcoder.stop()
+
+    async def cog_before_invoke(self, ctx: commands.Context) -> None:
+        quota_label.set(ctx.command.qualified_name)
+
+    async def _verify_file_index_periodically(self, interval: float) -> None:
+        index = get_file_index(self.download_folder_path)
+        while True:
+            await asyncio.sleep(interval)
+            if index.ready:
+                try:
+                    await asyncio.to_thread(index.verify)
+                except Exception:
+                    logger.exception("File index consistency check failed")
+
+    async def _evict_idle_guilds_periodically(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            evicted = guild_state.manager.evict_idle()
+            if evicted:
+                logger.info("Evicted %d guilds: %s", evicted, guild_state.manager.stats())
+
+    def _forget_guild(self, guild_id: int) -> None:
+        # Evicted guilds are idle, so only bookkeeping from their last session is left.
+        self._voice_mode.pop(guild_id, None)
+        self._track_ended.pop(guild_id, None)
+
+    async def _save_search_cache_periodically(self, interval: float = 300) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            self.search_cache.save()
 
 # Helpers
 
     async def play_next(self, guild_id: int, text_channel_id: int) -> None:
+        ended_at = self._track_ended.pop(guild_id, None)
+        self._cancel_linger(guild_id)
         try:
             queue = guild_state.get_queue(guild_id)
-            if not queue:
+            # Check and pop under one lock hold: !stop can clear the queue while we wait for it.
+            async with guild_state.get_guild_lock(guild_id):
+                song = queue.popleft() if queue else None
+            if song is None:
+                self._discard_prepared(guild_id)
                 vc = guild_state.get_voice_client(guild_id)
+                linger = self.config_manager.voice_linger
+                if vc and vc.is_connected() and linger > 0:
+                    self._linger_tasks[guild_id] = asyncio.create_task(
+                        self._disconnect_after_linger(guild_id, text_channel_id, linger)
+                    )
+                    channel = self.bot.get_channel(text_channel_id)
+                    if channel:
+                        await channel.send(f"Queue finished — staying connected for {linger}s.")
+                    return
                 if vc and vc.is_connected():
                     try:
                         await vc.disconnect()
@@ -46,16 +223,22 @@ class MusicCog(commands.Cog, name="Music"):
                     await channel.send("Queue finished — disconnecting.")
                 return
 
-            song = queue.pop(0)
-            song_file = get_song_file_path(song["id"], self.download_folder_path)
+            self.downloads.prefetch(queue)
+            song_file = get_song_file_path(song.id, self.download_folder_path)
             channel = self.bot.get_channel(text_channel_id)
 
-            if not song_file:
+            if not song_file and not song.stream_url:
                 if channel:
-                    await channel.send(f"Error: audio file not found for **{song['title']}**, skipping.")
-                await self.play_next(guild_id, text_channel_id)
+                    await channel.send(f"Downloading **{song.title}** before playing it...")
+                self._track_task(
+                    self._download_waits, guild_id,
+                    asyncio.create_task(self._play_after_download(guild_id, text_channel_id, song)),
+                )
                 return
 
+            if song_file:
+                song_file = self.transcoder.playable_path(song.id, song_file)
+
             vc = guild_state.get_voice_client(guild_id)
             if not vc or not vc.is_connected():
                 if channel:
@@ -66,23 +249,41 @@ class MusicCog(commands.Cog, name="Music"):
                 return
 
             def _after(error, g_id=guild_id, ch_id=text_channel_id):
+                # Runs on the audio player thread: hand off to the loop without waiting.
+                ended_at = time.perf_counter()
                 if error:
                     logger.error("Playback error for guild %s: %s", g_id, error)
-                try:
-                    future = asyncio.run_coroutine_threadsafe(
-                        self.play_next(g_id, ch_id), self.bot.loop
-                    )
-                    future.result(timeout=10)
-                except TimeoutError:
-                    logger.error("play_next timed out for guild %s", g_id)
-                    future.cancel()
-                except Exception as e:
-                    logger.error("Error scheduling play_next for guild %s: %s", g_id, e)
+                self.bot.loop.call_soon_threadsafe(self._on_track_end, g_id, ch_id, ended_at)
 
             try:
-                vc.play(discord.FFmpegPCMAudio(song_file), after=_after)
+                source = self._take_prepared(guild_id, song)
+                gap_mode = "prepared" if source is not None else "cold"
+                # Only the song a !play started from idle is traced, from FFmpeg startup to vc.play.
+                traced = (
+                    tracing.span("play_next", parent=song.span, prepared=source is not None)
+                    if song.span is not None else nullcontext()
+                )
+                with traced:
+                    if source is None and song_file:
+                        source = await create_audio_source(song_file, self.config_manager.audio_mode)
+                    elif source is None:
+                        # Still downloading: play the resolved stream URL directly.
+                        source = await create_audio_source(
+                            song.stream_url,
+                            self.config_manager.audio_mode,
+                            codec=song.acodec,
+                            before_options=stream_before_options(song.http_headers),
+                        )
+                    if ended_at is not None:
+                        source = FirstAudioTimer(source, partial(self._record_gap, guild_id, gap_mode, ended_at))
+                    if song.requested_at is not None:
+                        source = FirstAudioTimer(
+                            source, partial(self._record_first_audio, guild_id, song, time.perf_counter())
+                        )
+                    vc.play(source, after=_after)
                 if channel:
-                    await channel.send(f"Now playing: **{song['title']}**")
+                    await channel.send(f"Now playing: **{song.title}**")
+                await self._prepare_next(guild_id)
             except Exception as e:
                 logger.exception("Error starting playback for guild %s: %s", guild_id, e)
                 if channel:
@@ -92,21 +293,197 @@ class MusicCog(commands.Cog, name="Music"):
         except Exception:
             logger.exception("Unexpected error in play_next for guild %s", guild_id)
 
+    def _on_track_end(self, guild_id: int, text_channel_id: int, ended_at: float) -> None:
+        self._track_ended[guild_id] = ended_at
+        self._track_task(
+            self._transitions, guild_id, asyncio.create_task(self.play_next(guild_id, text_channel_id))
+        )
+
+    def _record_gap(self, guild_id: int, mode: str, ended_at: float, played_at: float) -> None:
+        # Called from the audio player thread on the next track's first frame.
+        gap = played_at - ended_at
+        self.gap_stats.record(mode, gap)
+        logger.debug("Gap between tracks for guild %s: %.1fms (%s)", guild_id, gap * 1000, mode)
+
+    async def _prepare_next(self, guild_id: int) -> None:
+        """Spawn FFmpeg for the next queued song and buffer its first frames.
+
+        Only songs already on disk are prepared; streams and pending downloads
+        are opened when they come up, as before.
+        """
+        queue = guild_state.get_queue(guild_id)
+        if not queue:
+            return
+        song = queue[0]
+        prepared = self._prepared.get(guild_id)
+        if prepared is not None and prepared[0] is song:
+            return
+        song_file = get_song_file_path(song.id, self.download_folder_path)
+        if not song_file:
+            return
+        song_file = self.transcoder.playable_path(song.id, song_file)
+        source = None
+        try:
+            source = PrimedSource(await create_audio_source(song_file, self.config_manager.audio_mode))
+            await asyncio.to_thread(source.prime)
+        except Exception:
+            logger.exception("Failed to prepare the next song for guild %s", guild_id)
+            if source is not None:
+                source.cleanup()
+            return
+        # !stop, a skip or another play_next may have moved the queue on while FFmpeg started.
+        queue = guild_state.guild_queues.get(guild_id)
+        prepared = self._prepared.get(guild_id)
+        if not queue or queue[0] is not song or (prepared is not None and prepared[0] is song):
+            source.cleanup()
+            return
+        self._discard_prepared(guild_id)
+        self._prepared[guild_id] = (song, source)
+
+    def _take_prepared(self, guild_id: int, song: QueueEntry) -> Optional[PrimedSource]:
+        prepared = self._prepared.pop(guild_id, None)
+        if prepared is None:
+            return None
+        if prepared[0] is song:
+            return prepared[1]
+        # The queue changed (skip, shuffle, remove) since it was prepared.
+        prepared[1].cleanup()
+        return None
+
+    def _discard_prepared(self, guild_id: int) -> None:
+        prepared = self._prepared.pop(guild_id, None)
+        if prepared is not None:
+            prepared[1].cleanup()
+
+    def _track_task(self, tasks: Dict[int, Set[asyncio.Task]], guild_id: int, task: asyncio.Task) -> None:
+        """Keep a reference to a fire-and-forget task until it finishes, and log its failure."""
+        tasks.setdefault(guild_id, set()).add(task)
+        task.add_done_callback(log_background_result)
+        task.add_done_callback(partial(self._forget_task, tasks, guild_id))
+
+    @staticmethod
+    def _forget_task(tasks: Dict[int, Set[asyncio.Task]], guild_id: int, task: asyncio.Task) -> None:
+        guild_tasks = tasks.get(guild_id)
+        if guild_tasks is not None:
+            guild_tasks.discard(task)
+            if not guild_tasks:
+                del tasks[guild_id]
+
+    @staticmethod
+    def _cancel_tasks(tasks: Dict[int, Set[asyncio.Task]], guild_id: int) -> None:
+        for task in tasks.pop(guild_id, ()):
+            task.cancel()
+
+    def _cancel_linger(self, guild_id: int) -> None:
+        task = self._linger_tasks.pop(guild_id, None)
+        if task is not None:
+            task.cancel()
+
+    async def _disconnect_after_linger(self, guild_id: int, text_channel_id: int, linger: float) -> None:
+        await asyncio.sleep(linger)
+        self._linger_tasks.pop(guild_id, None)
+        resume = False
+        async with guild_state.get_guild_lock(guild_id):
+            vc = guild_state.get_voice_client(guild_id)
+            if vc and vc.is_playing():
+                return
+            if guild_state.get_queue(guild_id):
+                # A song was queued just as the timer ran out; nobody else will start it.
+                resume = vc is not None and vc.is_connected()
+            else:
+                if vc and vc.is_connected():
+                    try:
+                        await vc.disconnect()
+                    except Exception:
+                        logger.exception("Error disconnecting voice client for guild %s", guild_id)
+                guild_state.set_voice_client(guild_id, None)
+                logger.info("Disconnected from voice in guild %s after %ss idle", guild_id, linger)
+        if resume:
+            await self.play_next(guild_id, text_channel_id)
+
+    def _record_first_audio(self, guild_id: int, song: QueueEntry, started_at: float, played_at: float) -> None:
+        # Called from the audio player thread on the first frame read.
+        tracing.record_span("first_audio", song.span, started_at, played_at)
+        seconds = played_at - song.requested_at
+        self.playback_stats.record(song.source, seconds)
+        self.voice_stats.record(self._voice_mode.get(guild_id, "connect"), seconds)
+        logger.info(
+            "Time to first audio for guild %s: %.2fs (%s) %s",
+            guild_id, seconds, song.source, song.id,
+        )
+
+    async def _play_after_download(self, guild_id: int, text_channel_id: int, song: QueueEntry) -> None:
+        """Fetch a queued song whose file is missing, then resume the queue with it."""
+        channel = self.bot.get_channel(text_channel_id)
+        song_file = await self.downloads.download(song.url, channel, song.id, PRIORITY_NOW)
+        if song_file:
+            async with guild_state.get_guild_lock(guild_id):
+                guild_state.get_queue(guild_id).insert(0, song)
+        elif channel:
+            await channel.send(f"Skipping **{song.title}**.")
+        await self.play_next(guild_id, text_channel_id)
+
     async def _connect_and_play(self, ctx: commands.Context) -> None:
         guild_id = ctx.guild.id
         vc = guild_state.get_voice_client(guild_id)
-        if not vc or not vc.is_playing():
-            if ctx.author.voice and ctx.author.voice.channel:
-                try:
-                    vc = await ctx.author.voice.channel.connect()
+        if vc and vc.is_playing():
+            await self._prepare_next(guild_id)
+            return
+        lingering = guild_id in self._linger_tasks
+        if vc and vc.is_connected() and not lingering:
+            # Between two songs: the running play_next picks up the new entry.
+            return
+        if not (ctx.author.voice and ctx.author.voice.channel):
+            await ctx.send("You must be in a voice channel for me to join and play music.")
+            return
+        channel = ctx.author.voice.channel
+        try:
+            with tracing.span("voice_connect", reuse=bool(vc and vc.is_connected())):
+                if vc and vc.is_connected():
+                    if vc.channel != channel:
+                        await vc.move_to(channel)
+                    self._voice_mode[guild_id] = "linger"
+                    self.voice_reuses += 1
+                else:
+                    vc = await channel.connect()
                     guild_state.set_voice_client(guild_id, vc)
-                except Exception:
-                    logger.exception("Failed to connect to voice channel for guild %s", guild_id)
-                    await ctx.send("Failed to connect to your voice channel.")
-                    return
-                await self.play_next(guild_id, ctx.channel.id)
-            else:
-                await ctx.send("You must be in a voice channel for me to join and play music.")
+                    self._voice_mode[guild_id] = "connect"
+                    self.voice_connects += 1
+        except Exception:
+            logger.exception("Failed to connect to voice channel for guild %s", guild_id)
+            await ctx.send("Failed to connect to your voice channel.")
+            return
+        await self.play_next(guild_id, ctx.channel.id)
+
+    async def _resolve_stream(self, ctx: commands.Context, video_url: str, video_id: str):
+        """Resolve the audio stream URL and start the download in the background.
+
+        Returns the queue entry fields needed to stream, {} if the song can't
+        be streamed from a single URL, or None after reporting an error.
+        """
+        info = self.downloads.resolved_info(video_id)
+        if info is None:
+            result = await asyncio.to_thread(
+                resolve_song_sync, video_url,
+                self.download_folder_path, self.config_manager.max_song_time,
+            )
+            if "error" in result:
+                await ctx.send(download_error_message(result))
+                return None
+            info = result.get("info")
+            if not info:
+                await ctx.send("Download error: could not retrieve info.")
+                return None
+            self.downloads.submit(
+                video_url, video_id, PRIORITY_REQUEST, info
+            ).add_done_callback(log_background_result)
+        if not info.get("url"):
+            return {}
+        return {
+            "stream_url": info["url"],
+            "http_headers": info.get("http_headers"),
+            "acodec": info.get("acodec"),
+        }
 
     async def _queue_song(
         self,
@@ -114,34 +491,48 @@ class MusicCog(commands.Cog, name="Music"):
         song_title: str,
         video_url: str,
         video_id: str,
+        requested_at: Optional[float] = None,
     ) -> None:
+        entry = QueueEntry(song_title, video_url, video_id)
+        vc = guild_state.get_voice_client(ctx.guild.id)
+        idle = not (vc and vc.is_playing()) and not guild_state.get_queue(ctx.guild.id)
+        if requested_at is not None and idle:
+            entry.requested_at = requested_at
+            entry.span = tracing.current_span()
+
         if not get_song_file_path(video_id, self.download_folder_path):
-            await ctx.send(f"Downloading **{song_title}**...")
-            downloaded = await download_song(
-                video_url, ctx,
-                self.download_folder_path,
-                self.config_manager.max_song_time,
-                self.library_path,
-                self.download_folder,
-            )
-            if downloaded is None:
-                return
-            await ctx.send(f"Downloaded **{song_title}**.")
+            stream = None
+            if self.config_manager.stream_while_downloading:
+                stream = await self._resolve_stream(ctx, video_url, video_id)
+                if stream is None:
+                    return
+            if stream:
+                entry.stream_url = stream["stream_url"]
+                entry.http_headers = stream["http_headers"]
+                entry.acodec = stream["acodec"]
+                entry.source = "stream"
+                await ctx.send(f"Streaming **{song_title}** while it downloads...")
+            else:
+                await ctx.send(f"Downloading **{song_title}**...")
+                downloaded = await self.downloads.download(
+                    video_url, ctx, video_id,
+                    PRIORITY_NOW if idle else PRIORITY_REQUEST,
+                )
+                if downloaded is None:
+                    return
+                entry.source = "download"
+                await ctx.send(f"Downloaded **{song_title}**.")
 
         async with guild_state.get_guild_lock(ctx.guild.id):
-            guild_state.get_queue(ctx.guild.id).append(
-                {"title": song_title, "url": video_url, "id": video_id}
-            )
+            queue = guild_state.get_queue(ctx.guild.id)
+            queue.append(entry)
+            self.downloads.prefetch(queue)
         await ctx.send(f"Added **{song_title}** to the queue.")
         await self._connect_and_play(ctx)
 
     def _search_library(self, query: str):
-        lib = load_library(self.library_path)
-        query_lower = query.lower()
-        for song in lib.values():
-            if query_lower in song.get("title", "").lower():
-                return song
-        return None
+        matches = self.song_library.search(query, limit=1)
+        return matches[0] if matches else None
 
 # Commands
 
@@ -150,7 +541,7 @@ class MusicCog(commands.Cog, name="Music"):
     async def search(self, ctx: commands.Context, *, query: str):
         """Searches YouTube for a song and shows the top result."""
         await ctx.send(f"Searching for: {query}")
-        results = await search_song(query, self.config_manager.youtube_api_key)
+        _, results = await self.search_racer.search(query)
         if not results:
             await ctx.send("No results found. Try a different search.")
             return
@@ -169,66 +560,43 @@ class MusicCog(commands.Cog, name="Music"):
     @commands.cooldown(1, 5, commands.BucketType.user)
     async def play(self, ctx: commands.Context, *, song_name: str):
         """Plays a song — checks local library first, then YouTube."""
+        requested_at = time.perf_counter()
+
+        with tracing.trace("play", query=song_name, guild=ctx.guild.id):
+            # 1. Check local library before making any network calls
+            with tracing.span("library_lookup"):
+                local = self._search_library(song_name)
+            if local:
+                video_id = local["url"].split("=")[-1]
+                if get_song_file_path(video_id, self.download_folder_path):
+                    await ctx.send(f"Found **{local['title']}** in local library.")
+                    await self._queue_song(ctx, local["title"], local["url"], video_id, requested_at)
+                    return
 
-        # 1. Check local library before making any network calls
-        local = self._search_library(song_name)
-        if local:
-            video_id = local["url"].split("=")[-1]
-            if get_song_file_path(video_id, self.download_folder_path):
-                await ctx.send(f"Found **{local['title']}** in local library.")
-                await self._queue_song(ctx, local["title"], local["url"], video_id)
+            # 2. Search YouTube (API and/or yt_dlp per SEARCH_MODE; results cached for SEARCH_CACHE_TTL)
+            with tracing.span("search") as span:
+                provider, results = await self.search_racer.search(song_name)
+                span.attrs["provider"] = provider
+            if not results:
+                await ctx.send("No results found. Try a different query.")
                 return
 
-        # 2. Call YouTube API (results cached for 5 min)
-        results = await search_song(song_name, self.config_manager.youtube_api_key)
-
-        if results:
             video = results[0]
             if "title" not in video or "videoId" not in video:
                 await ctx.send("Invalid data from search. Please try again.")
                 return
+            if provider == PROVIDER_YTSEARCH:
+                if self.search_racer.mode == "sequential":
+                    await ctx.send(f"No API result found — using yt_dlp fallback: **{video['title']}**")
+                else:
+                    await ctx.send(f"Found **{video['title']}** via yt_dlp search.")
             await self._queue_song(
                 ctx,
                 video["title"],
                 f"https://www.youtube.com/watch?v={video['videoId']}",
                 video["videoId"],
+                requested_at,
             )
-            return
-
-        # 3. Fall back to yt_dlp if YouTube API returns nothing
-        try:
-            ydl_opts = {
-                "quiet": True,
-                "no_warnings": True,
-                "extract_flat": True,
-                "default_search": "ytsearch",
-            }
-
-            def _ytsearch(query: str):
-                import yt_dlp
-                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                    return ydl.extract_info(query, download=False)
-
-            info = await asyncio.to_thread(_ytsearch, song_name)
-            if not info or "entries" not in info or not info["entries"]:
-                await ctx.send("No results found. Try a different query.")
-                return
-
-            video = info["entries"][0]
-            video_url = video.get("webpage_url", "")
-            video_id = video.get("id", "")
-            song_title = video.get("title", song_name)
-
-            if not video_url:
-                await ctx.send("No results found. Try a different query.")
-                return
-
-            await ctx.send(f"No API result found — using yt_dlp fallback: **{song_title}**")
-            await self._queue_song(ctx, song_title, video_url, video_id)
-
-        except Exception as e:
-            logger.exception("yt_dlp fallback search failed: %s", e)
-            await ctx.send(f"Error searching for song: {e}")
 
     @commands.command(name="queue")
     async def show_queue(self, ctx: commands.Context):
@@ -237,9 +605,67 @@ class MusicCog(commands.Cog, name="Music"):
         if not queue:
             await ctx.send("The queue is empty!")
             return
-        lines = "\n".join(f"{i + 1}. {s['title']}" for i, s in enumerate(queue))
+        lines = "\n".join(f"{i + 1}. {s.title}" for i, s in enumerate(queue))
         await ctx.send(f"**Current Queue:**\n{lines}")
 
+    @commands.command(name="downloads")
+    async def show_downloads(self, ctx: commands.Context):
+        """Shows the download queue depth and recent wait times."""
+        stats = self.downloads.stats()
+        await ctx.send(
+            f"**Downloads:** {stats['running']} running, {stats['queued']} queued "
+            f"on {stats['workers']} workers. Wait avg {stats['avg_wait_s']:.1f}s, "
+            f"max {stats['max_wait_s']:.1f}s. Completed {stats['completed']}, failed {stats['failed']}."
+        )
+
+    @commands.command(name="stats")
+    async def show_stats(self, ctx: commands.Context):
+        """Shows time to first audio, gaps between tracks and search cache/provider stats."""
+        summary = self.playback_stats.summary()
+        if summary:
+            first_audio = "**Time to first audio:**\n" + "\n".join(
+                f"• {mode}: median {s['median_s']:.2f}s, p95 {s['p95_s']:.2f}s ({s['count']} plays)"
+                for mode, s in sorted(summary.items())
+            )
+        else:
+            first_audio = "No playback measurements yet."
+        sections = [first_audio]
+
+        cache = self.search_cache.stats()
+        sections.append(
+            f"**Search cache:** {cache['size']} entries, {cache['hits']} hits, "
+            f"{cache['misses']} misses ({cache['hit_rate']:.0%} hit rate)"
+        )
+        search = self.search_racer.stats()
+        sections.append(
+            f"**Search ({search['mode']}, hedge {search['hedge_delay_s']:.2f}s):** "
+            + ", ".join(
+                f"{name} {p['wins']}/{p['calls']} wins, {p['success_rate']:.0%} found, "
+                f"median {p['median_s']:.2f}s, p90 {p['p90_s']:.2f}s"
+                for name, p in search["providers"].items()
+            )
+        )
+        guilds = guild_state.manager.stats()
+        sections.append(
+            f"**Guild state:** {guilds['guilds']} guilds (peak {guilds['peak_guilds']}), "
+            f"{guilds['queued_songs']} queued songs, ~{guilds['approx_bytes'] // 1024} KiB, "
+            f"evicted {guilds['evicted_idle']} idle / {guilds['evicted_lru']} over cap"
+        )
+        voice = self.voice_stats.summary()
+        voice_section = f"**Voice:** {self.voice_connects} connects, {self.voice_reuses} reused while lingering"
+        if voice:
+            voice_section += " — first audio " + ", ".join(
+                f"{mode} median {v['median_s']:.2f}s ({v['count']})" for mode, v in sorted(voice.items())
+            )
+        sections.append(voice_section)
+        gaps = self.gap_stats.summary()
+        if gaps:
+            sections.append("**Gap between tracks:** " + ", ".join(
+                f"{mode} median {g['median_s'] * 1000:.0f}ms, p95 {g['p95_s'] * 1000:.0f}ms ({g['count']})"
+                for mode, g in sorted(gaps.items())
+            ))
+        await ctx.send("\n".join(sections))
+
     @commands.command(name="skip")
     async def skip(self, ctx: commands.Context):
         """Skips the current song."""
@@ -254,6 +680,8 @@ class MusicCog(commands.Cog, name="Music"):
     async def stop(self, ctx: commands.Context):
         """Stops playback and clears the queue."""
         guild_id = ctx.guild.id
+        self._cancel_linger(guild_id)
+        self._cancel_tasks(self._download_waits, guild_id)
         vc = guild_state.get_voice_client(guild_id)
         if vc:
             try:
@@ -263,24 +691,25 @@ class MusicCog(commands.Cog, name="Music"):
             except Exception:
                 logger.exception("Error stopping voice client for guild %s", guild_id)
             guild_state.set_voice_client(guild_id, None)
-        guild_state.guild_queues[guild_id] = []
+        async with guild_state.get_guild_lock(guild_id):
+            guild_state.get_queue(guild_id).clear()
+        self._discard_prepared(guild_id)
         await ctx.send("Stopped and cleared the queue.")
 
     @commands.command(name="library")
     async def library(self, ctx: commands.Context, *, query: Optional[str] = None):
         """Lists or searches the downloaded song library."""
-        lib = load_library(self.library_path)
-        if not lib:
+        if not len(self.song_library):
             await ctx.send("The song library is empty!")
             return
 
         if query is None:
-            songs = list(lib.values())[:20]
+            songs = self.song_library.head(20)
             lines = "\n".join(f"• {s['title']} (by {s['uploader']})" for s in songs)
             await ctx.send(f"**First 20 songs in the library:**\n{lines}")
             return
 
-        matches = [s for s in lib.values() if query.lower() in s["title"].lower()]
+        matches = self.song_library.search(query, limit=20)
         if not matches:
             await ctx.send(f"No songs found matching `{query}`.")
             return
@@ -294,23 +723,19 @@ class MusicCog(commands.Cog, name="Music"):
     @commands.command(name="shuffle")
     async def shuffle(self, ctx: commands.Context):
         """Adds 10 random songs from the library to the queue and shuffles it."""
-        lib = load_library(self.library_path)
-        if not lib:
+        selected = self.song_library.sample(10)
+        if not selected:
             await ctx.send("The song library is empty!")
             return
 
-        selected = random.sample(list(lib.values()), min(10, len(lib)))
         guild_id = ctx.guild.id
 
         async with guild_state.get_guild_lock(guild_id):
             q = guild_state.get_queue(guild_id)
-            for song in selected:
-                q.append({
-                    "title": song["title"],
-                    "url": song["url"],
-                    "id": song["url"].split("=")[1],
-                })
-            random.shuffle(q)
+            for record in selected:
+                q.append(QueueEntry(record["title"], record["url"], record["url"].split("=")[1]))
+            q.shuffle()
+            self.downloads.prefetch(q)
 
         await ctx.send(f"Shuffled {len(selected)} random songs into the queue!")
         await self._connect_and_play(ctx)
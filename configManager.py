@@ -3,6 +3,40 @@ from dataclasses import dataclass
 from dotenv import load_dotenv
 
 _SENSITIVE_KEYS = {"BOT_TOKEN", "YOUTUBE_API_KEY"}
+_LIBRARY_BACKENDS = ("json", "sqlite")
+_AUDIO_MODES = ("opus", "pcm")
+_SEARCH_MODES = ("sequential", "race", "hedge")
+
+
+def _optional_choice(key: str, default: str, choices: tuple) -> str:
+    value = os.getenv(key, "").strip().lower() or default
+    if value not in choices:
+        raise ValueError(f"{key} must be one of {', '.join(choices)}, got: '{value}'")
+    return value
+
+
+def _optional_number(key: str, default, cast=int, minimum=0):
+    raw = os.getenv(key, "").strip()
+    if not raw:
+        return default
+    try:
+        value = cast(raw)
+    except ValueError:
+        kind = "an integer" if cast is int else "a number"
+        raise ValueError(f"{key} must be {kind}, got: '{raw}'")
+    if value < minimum:
+        raise ValueError(f"{key} must be at least {minimum}, got: {value}")
+    return value
+
+def _optional_bool(key: str, default: bool) -> bool:
+    raw = os.getenv(key, "").strip().lower()
+    if not raw:
+        return default
+    if raw in ("1", "true", "yes", "on"):
+        return True
+    if raw in ("0", "false", "no", "off"):
+        return False
+    raise ValueError(f"{key} must be true or false, got: '{raw}'")
 
 @dataclass
 class BotConfig:
@@ -11,6 +45,26 @@ class BotConfig:
     youtube_api_key: str
     max_song_time: int
     download_folder: str
+    library_backend: str = "json"
+    scan_workers: int = 4
+    scan_rate_limit: float = 2.0
+    download_workers: int = 2
+    prefetch_depth: int = 3
+    stream_while_downloading: bool = False
+    audio_mode: str = "opus"
+    transcode_workers: int = 0
+    search_cache_ttl: int = 21600
+    search_cache_size: int = 1000
+    search_cache_persist: bool = True
+    youtube_daily_quota: int = 10000
+    file_index_watch: bool = False
+    file_index_verify_interval: int = 600
+    search_mode: str = "sequential"
+    search_hedge_delay: float = 1.5
+    guild_idle_ttl: int = 3600
+    max_guilds: int = 1000
+    voice_linger: int = 60
+    metrics_port: int = 0
 
 class ConfigManager:
     def __init__(self, config_file_path: str = ".env"):
@@ -64,6 +118,26 @@ class ConfigManager:
             youtube_api_key=os.environ["YOUTUBE_API_KEY"],
             max_song_time=max_song_time,
             download_folder=os.environ["DOWNLOAD_FOLDER"],
+            library_backend=_optional_choice("LIBRARY_BACKEND", "json", _LIBRARY_BACKENDS),
+            scan_workers=_optional_number("SCAN_WORKERS", 4, minimum=1),
+            scan_rate_limit=_optional_number("SCAN_RATE_LIMIT", 2.0, cast=float),
+            download_workers=_optional_number("DOWNLOAD_WORKERS", 2, minimum=1),
+            prefetch_depth=_optional_number("PREFETCH_DEPTH", 3),
+            stream_while_downloading=_optional_bool("STREAM_WHILE_DOWNLOADING", False),
+            audio_mode=_optional_choice("AUDIO_MODE", "opus", _AUDIO_MODES),
+            transcode_workers=_optional_number("TRANSCODE_WORKERS", 0),
+            search_cache_ttl=_optional_number("SEARCH_CACHE_TTL", 21600),
+            search_cache_size=_optional_number("SEARCH_CACHE_SIZE", 1000),
+            search_cache_persist=_optional_bool("SEARCH_CACHE_PERSIST", True),
+            youtube_daily_quota=_optional_number("YOUTUBE_DAILY_QUOTA", 10000),
+            file_index_watch=_optional_bool("FILE_INDEX_WATCH", False),
+            file_index_verify_interval=_optional_number("FILE_INDEX_VERIFY_INTERVAL", 600),
+            search_mode=_optional_choice("SEARCH_MODE", "sequential", _SEARCH_MODES),
+            search_hedge_delay=_optional_number("SEARCH_HEDGE_DELAY", 1.5, cast=float),
+            guild_idle_ttl=_optional_number("GUILD_IDLE_TTL", 3600),
+            max_guilds=_optional_number("MAX_GUILDS", 1000),
+            voice_linger=_optional_number("VOICE_LINGER", 60),
+            metrics_port=_optional_number("METRICS_PORT", 0),
         )
 
         for key in _SENSITIVE_KEYS:
@@ -89,6 +163,86 @@ class ConfigManager:
     def download_folder(self) -> str:
         return self._config.download_folder
 
+    @property
+    def library_backend(self) -> str:
+        return self._config.library_backend
+
+    @property
+    def scan_workers(self) -> int:
+        return self._config.scan_workers
+
+    @property
+    def scan_rate_limit(self) -> float:
+        return self._config.scan_rate_limit
+
+    @property
+    def download_workers(self) -> int:
+        return self._config.download_workers
+
+    @property
+    def prefetch_depth(self) -> int:
+        return self._config.prefetch_depth
+
+    @property
+    def stream_while_downloading(self) -> bool:
+        return self._config.stream_while_downloading
+
+    @property
+    def audio_mode(self) -> str:
+        return self._config.audio_mode
+
+    @property
+    def transcode_workers(self) -> int:
+        return self._config.transcode_workers
+
+    @property
+    def search_cache_ttl(self) -> int:
+        return self._config.search_cache_ttl
+
+    @property
+    def search_cache_size(self) -> int:
+        return self._config.search_cache_size
+
+    @property
+    def search_cache_persist(self) -> bool:
+        return self._config.search_cache_persist
+
+    @property
+    def youtube_daily_quota(self) -> int:
+        return self._config.youtube_daily_quota
+
+    @property
+    def file_index_watch(self) -> bool:
+        return self._config.file_index_watch
+
+    @property
+    def file_index_verify_interval(self) -> int:
+        return self._config.file_index_verify_interval
+
+    @property
+    def search_mode(self) -> str:
+        return self._config.search_mode
+
+    @property
+    def search_hedge_delay(self) -> float:
+        return self._config.search_hedge_delay
+
+    @property
+    def guild_idle_ttl(self) -> int:
+        return self._config.guild_idle_ttl
+
+    @property
+    def max_guilds(self) -> int:
+        return self._config.max_guilds
+
+    @property
+    def voice_linger(self) -> int:
+        return self._config.voice_linger
+
+    @property
+    def metrics_port(self) -> int:
+        return self._config.metrics_port
+
     def __repr__(self) -> str:
         return (
             f"ConfigManager("
@@ -96,6 +250,26 @@ class ConfigManager:
             f"bot_owner={self._config.bot_owner}, "
             f"youtube_api_key='***', "
             f"max_song_time={self._config.max_song_time}, "
-            f"download_folder='{self._config.download_folder}'"
+            f"download_folder='{self._config.download_folder}', "
+            f"library_backend='{self._config.library_backend}', "
+            f"scan_workers={self._config.scan_workers}, "
+            f"scan_rate_limit={self._config.scan_rate_limit}, "
+            f"download_workers={self._config.download_workers}, "
+            f"prefetch_depth={self._config.prefetch_depth}, "
+            f"stream_while_downloading={self._config.stream_while_downloading}, "
+            f"audio_mode='{self._config.audio_mode}', "
+            f"transcode_workers={self._config.transcode_workers}, "
+            f"search_cache_ttl={self._config.search_cache_ttl}, "
+            f"search_cache_size={self._config.search_cache_size}, "
+            f"search_cache_persist={self._config.search_cache_persist}, "
+            f"youtube_daily_quota={self._config.youtube_daily_quota}, "
+            f"file_index_watch={self._config.file_index_watch}, "
+            f"file_index_verify_interval={self._config.file_index_verify_interval}, "
+            f"search_mode='{self._config.search_mode}', "
+            f"search_hedge_delay={self._config.search_hedge_delay}, "
+            f"guild_idle_ttl={self._config.guild_idle_ttl}, "
+            f"max_guilds={self._config.max_guilds}, "
+            f"voice_linger={self._config.voice_linger}, "
+            f"metrics_port={self._config.metrics_port}"
             f")"
         )
\ No newline at end of file
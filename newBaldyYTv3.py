@@ -4,7 +4,11 @@ from pathlib import Path
 import discord
 from discord.ext import commands
 from configManager import ConfigManager
-from utils.library import scan_and_update_library
+from utils import guild_state, tracing
+from utils.library import get_library_store, scan_and_update_library
+from utils.metadata import MetadataResolver
+from utils.metrics import MetricsServer, install_command_hooks
+from utils.youtube_api import QuotaLedger, get_youtube_client
 
 if not discord.opus.is_loaded():
     discord.opus.load_opus("/usr/lib/libopus.so.0")
@@ -27,10 +31,26 @@ config_manager = ConfigManager(str(config_file_path))
 download_folder_path = script_dir / config_manager.download_folder
 download_folder_path.mkdir(parents=True, exist_ok=True)
 
+# Library (opened once, shared by every cog)
+get_library_store(library_path, config_manager.library_backend)
+
+# YouTube API client (built once, quota tracked in the index folder)
+get_youtube_client(
+    config_manager.youtube_api_key,
+    QuotaLedger(config_manager.youtube_daily_quota, INDEX_FOLDER / "youtube_quota.json"),
+)
+
+# Tracing (finished spans of each !play are appended as JSON lines by a background thread)
+tracing.tracer.configure(INDEX_FOLDER / "traces.jsonl")
+
+# Per-guild state (idle guilds are evicted by the music cog)
+guild_state.manager.configure(config_manager.guild_idle_ttl, config_manager.max_guilds)
+
 # Bot
 intents = discord.Intents.default()
 intents.message_content = True
 bot = commands.Bot(command_prefix="!", intents=intents)
+install_command_hooks(bot)
 
 @bot.event
 async def on_ready():
@@ -42,6 +62,12 @@ async def on_ready():
         download_folder_path,
         library_path,
         config_manager.download_folder,
+        False,
+        MetadataResolver(
+            config_manager.scan_workers,
+            config_manager.scan_rate_limit,
+            config_manager.youtube_api_key,
+        ),
     )
     logger.info("Library scan complete. Bot ready.")
 
@@ -61,7 +87,16 @@ async def main():
         )
         await setup_admin(bot, config_manager, download_folder_path, library_path)
 
-        await bot.start(config_manager.bot_token)
+        metrics_server = None
+        if config_manager.metrics_port:
+            metrics_server = MetricsServer(config_manager.metrics_port)
+            await metrics_server.start()
+        try:
+            await bot.start(config_manager.bot_token)
+        finally:
+            if metrics_server is not None:
+                await metrics_server.stop()
+            await asyncio.to_thread(tracing.tracer.close)
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -1,118 +1,211 @@
 import logging
+import re
 from pathlib import Path
 from typing import Dict, List, Optional, Any
 import yt_dlp
 import asyncio
-from discord.ext import commands
-from googleapiclient.discovery import build
+import contextvars
+from concurrent.futures import Executor
 from googleapiclient.errors import HttpError
 
+from utils import tracing
+from utils.file_index import get_file_index
 from utils.library import update_song_library
+from utils.youtube_api import QuotaExceeded, get_youtube_client
 
 logger = logging.getLogger("newBaldy.downloader")
 
+_VIDEO_ID_RE = re.compile(r"(?:v=|youtu\.be/|shorts/)([A-Za-z0-9_\-]{6,16})")
+
 
 def get_song_file_path(song_id: str, download_folder_path: Path) -> Optional[str]:
-    for ext in (".webm", ".m4a", ".mp3", ".opus", ".mp4"):
-        file_path = download_folder_path / f"{song_id}{ext}"
-        if file_path.exists():
-            return str(file_path)
-    return None
-
-
-async def search_song(query: str, youtube_api_key: str) -> List[Dict[str, Any]]:
-    """Search YouTube Data API v3 for a video matching the query."""
-    def _search_sync(q: str) -> List[Dict[str, Any]]:
-        try:
-            youtube = build("youtube", "v3", developerKey=youtube_api_key)
-            search_response = (
-                youtube.search()
-                .list(q=q, part="snippet", maxResults=1, type="video")
-                .execute()
-            )
-            return [
-                {
-                    "title": item["snippet"]["title"],
-                    "videoId": item["id"]["videoId"],
-                    "author": item["snippet"]["channelTitle"],
-                }
-                for item in search_response.get("items", [])
-            ]
-        except HttpError as e:
-            logger.exception("YouTube API error for query '%s': %s", q, e)
-            return []
-        except Exception:
-            logger.exception("Unexpected YouTube API error for query '%s'", q)
-            return []
-
-    return await asyncio.to_thread(_search_sync, query)
-
-
-async def download_song(
+    return get_file_index(download_folder_path).lookup(song_id)
+
+
+def api_search_sync(query: str, youtube_api_key: str) -> List[Dict[str, Any]]:
+    """Search YouTube Data API v3; returns [] on quota exhaustion or API errors."""
+    try:
+        items = get_youtube_client(youtube_api_key).search(query, max_results=1)
+        return [
+            {
+                "title": item["snippet"]["title"],
+                "videoId": item["id"]["videoId"],
+                "author": item["snippet"]["channelTitle"],
+            }
+            for item in items
+        ]
+    except QuotaExceeded as e:
+        logger.warning("Skipping YouTube API search for '%s': %s", query, e)
+        return []
+    except HttpError as e:
+        logger.exception("YouTube API error for query '%s': %s", query, e)
+        return []
+    except Exception:
+        logger.exception("Unexpected YouTube API error for query '%s'", query)
+        return []
+
+
+def ytsearch_sync(query: str) -> List[Dict[str, Any]]:
+    """Search with yt_dlp's ytsearch (no API quota); same result shape as api_search_sync."""
+    ydl_opts = {
+        "quiet": True,
+        "no_warnings": True,
+        "extract_flat": True,
+        "default_search": "ytsearch",
+    }
+    try:
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            info = ydl.extract_info(query, download=False)
+    except Exception:
+        logger.exception("yt_dlp search failed for query '%s'", query)
+        return []
+    results = []
+    for entry in (info or {}).get("entries") or []:
+        if entry and entry.get("id"):
+            results.append({
+                "title": entry.get("title") or query,
+                "videoId": entry["id"],
+                "author": entry.get("channel") or entry.get("uploader") or "Unknown",
+            })
+    return results
+
+
+def _ydl_options(download_folder_path: Path, match_filter=None) -> Dict[str, Any]:
+    return {
+        "format": "bestaudio/best",
+        "outtmpl": str(download_folder_path / "%(id)s.%(ext)s"),
+        "noplaylist": True,
+        "quiet": True,
+        "no_warnings": True,
+        "extract_flat": False,
+        "force_generic_extractor": False,
+        "youtube_include_dash_manifest": False,
+        "ignoreerrors": True,
+        "verbose": False,
+        "match_filter": match_filter,
+    }
+
+
+def _extract_sync(
+    download_url: str,
+    download_folder_path: Path,
+    max_song_time: int,
+    download: bool,
+) -> Dict[str, Any]:
+    rejected: Dict[str, Any] = {}
+
+    def _duration_filter(info: Dict[str, Any], *, incomplete: bool = False) -> Optional[str]:
+        duration = info.get("duration")
+        if duration and duration > max_song_time:
+            rejected["duration"] = duration
+            return f"duration {duration}s exceeds {max_song_time}s"
+        return None
+
+    try:
+        with yt_dlp.YoutubeDL(_ydl_options(download_folder_path, _duration_filter)) as ydl:
+            info_dict = ydl.extract_info(download_url, download=download)
+            if "duration" in rejected:
+                return {"error": "duration", "duration": rejected["duration"], "max": max_song_time}
+            return {"info": info_dict}
+    except Exception as e:
+        logger.exception("Download error for %s: %s", download_url, e)
+        return {"error": "exception", "exception": str(e)}
+
+
+def download_song_sync(
+    download_url: str,
+    download_folder_path: Path,
+    max_song_time: int,
+) -> Dict[str, Any]:
+    """Extract and download in one yt_dlp pass, rejecting songs over max_song_time.
+
+    The duration check runs as a match_filter, which yt_dlp evaluates after
+    extraction but before fetching any media, so over-long songs cost a
+    single page extraction and nothing is written to disk.
+    """
+    with tracing.span("download_song", url=download_url):
+        return _extract_sync(download_url, download_folder_path, max_song_time, download=True)
+
+
+def resolve_song_sync(
+    download_url: str,
+    download_folder_path: Path,
+    max_song_time: int,
+) -> Dict[str, Any]:
+    """Extract without downloading; the info carries the selected audio stream URL."""
+    with tracing.span("resolve_song", url=download_url):
+        return _extract_sync(download_url, download_folder_path, max_song_time, download=False)
+
+
+def download_resolved_sync(info_dict: Dict[str, Any], download_folder_path: Path) -> Dict[str, Any]:
+    """Download a song from an info dict returned by resolve_song_sync, without re-extracting."""
+    try:
+        with tracing.span("download_song", url=info_dict.get("webpage_url")), \
+                yt_dlp.YoutubeDL(_ydl_options(download_folder_path)) as ydl:
+            return {"info": ydl.process_ie_result(info_dict, download=True)}
+    except Exception as e:
+        logger.exception("Download error for %s: %s", info_dict.get("id"), e)
+        return {"error": "exception", "exception": str(e)}
+
+
+async def fetch_and_index(
     url: str,
-    ctx: commands.Context,
     download_folder_path: Path,
     max_song_time: int,
     library_path: Path,
     download_folder: str,
-) -> Optional[str]:
-    """Download a song via yt_dlp, enforcing the duration limit and updating the library."""
-
-    def _download_sync(download_url: str) -> Optional[Dict[str, Any]]:
-        ydl_opts = {
-            "format": "bestaudio/best",
-            "outtmpl": str(download_folder_path / "%(id)s.%(ext)s"),
-            "noplaylist": True,
-            "quiet": True,
-            "no_warnings": True,
-            "extract_flat": False,
-            "force_generic_extractor": False,
-            "youtube_include_dash_manifest": False,
-            "ignoreerrors": True,
-            "verbose": False,
-        }
-        try:
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info_dict = ydl.extract_info(download_url, download=False)
-                duration = info_dict.get("duration", 0)
-                if duration and duration > max_song_time:
-                    return {"error": "duration", "duration": duration, "max": max_song_time}
-                info_dict = ydl.extract_info(download_url, download=True)
-                return {"info": info_dict}
-        except Exception as e:
-            logger.exception("Download error for %s: %s", download_url, e)
-            return {"error": "exception", "exception": str(e)}
-
-    result = await asyncio.to_thread(_download_sync, url)
-
+    executor: Optional[Executor] = None,
+    resolved_info: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """Download url and add it to the library; returns {"file": path} or an error dict.
+
+    If resolved_info (from resolve_song_sync) is given, it is downloaded as-is
+    instead of extracting the page again.
+    """
+    loop = asyncio.get_running_loop()
+    # run_in_executor doesn't carry contextvars over; copy them so the thread's spans join the trace.
+    context = contextvars.copy_context()
+    if resolved_info is not None:
+        result = await loop.run_in_executor(
+            executor, context.run, download_resolved_sync, resolved_info, download_folder_path
+        )
+    else:
+        result = await loop.run_in_executor(
+            executor, context.run, download_song_sync, url, download_folder_path, max_song_time
+        )
     if not result:
-        await ctx.send("Download error: unknown error.")
-        return None
-
+        return {"error": "message", "message": "Download error: unknown error."}
     if "error" in result:
-        if result["error"] == "duration":
-            await ctx.send(
-                f"Song duration ({result['duration']}s) exceeds the "
-                f"maximum allowed duration of {result['max']}s."
-            )
-        else:
-            await ctx.send(f"Download error: {result.get('exception', 'unknown')}")
-        return None
+        return result
 
     info_dict = result.get("info")
     if not info_dict:
-        await ctx.send("Download error: could not retrieve info after download.")
-        return None
+        return {"error": "message", "message": "Download error: could not retrieve info after download."}
 
     video_id = info_dict.get("id")
     if not video_id:
-        await ctx.send("Download error: missing video ID.")
-        return None
+        return {"error": "message", "message": "Download error: missing video ID."}
 
-    actual_file = get_song_file_path(video_id, download_folder_path)
+    with tracing.span("index_refresh", song=video_id):
+        actual_file = get_file_index(download_folder_path).refresh(video_id)
     if actual_file is None:
-        await ctx.send("Error: downloaded file not found on disk.")
-        return None
+        return {"error": "message", "message": "Error: downloaded file not found on disk."}
 
     await asyncio.to_thread(update_song_library, info_dict, library_path, download_folder)
-    return actual_file
+    return {"file": actual_file, "id": video_id}
+
+
+def download_error_message(result: Dict[str, Any]) -> str:
+    if result["error"] == "duration":
+        return (
+            f"Song duration ({result['duration']}s) exceeds the "
+            f"maximum allowed duration of {result['max']}s."
+        )
+    if result["error"] == "message":
+        return result["message"]
+    return f"Download error: {result.get('exception', 'unknown')}"
+
+
+def video_id_from_url(url: str) -> Optional[str]:
+    match = _VIDEO_ID_RE.search(url)
+    return match.group(1) if match else None
@@ -0,0 +1,161 @@
+import ctypes
+import ctypes.util
+import logging
+import os
+import struct
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+logger = logging.getLogger("newBaldy.file_index")
+
+# In lookup preference order when several files exist for one video ID.
+SUPPORTED_EXTENSIONS = (".webm", ".m4a", ".mp3", ".opus", ".mp4")
+_RANK = {ext: i for i, ext in enumerate(SUPPORTED_EXTENSIONS)}
+
+_IN_CLOSE_WRITE = 0x008
+_IN_MOVED_FROM = 0x040
+_IN_MOVED_TO = 0x080
+_IN_CREATE = 0x100
+_IN_DELETE = 0x200
+_IN_EVENT = struct.Struct("iIII")
+
+
+class FileIndex:
+    """In-memory map of video ID -> audio file in the download folder.
+
+    Until the first rebuild() lookups probe the disk like they used to; after
+    that they are served from memory without any syscalls. The index is kept
+    current by downloads and removals calling refresh(), optionally
+    by an inotify watch, and verify() repairs anything changed behind its back.
+    """
+
+    def __init__(self, folder: Path):
+        self.folder = folder
+        self._files: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.ready = False
+        self._watch_thread: Optional[threading.Thread] = None
+
+    def _probe(self, video_id: str) -> Optional[str]:
+        for ext in SUPPORTED_EXTENSIONS:
+            if (self.folder / f"{video_id}{ext}").exists():
+                return f"{video_id}{ext}"
+        return None
+
+    def lookup(self, video_id: str) -> Optional[str]:
+        if not self.ready:
+            filename = self._probe(video_id)
+        else:
+            filename = self._files.get(video_id)
+        return str(self.folder / filename) if filename else None
+
+    def __len__(self) -> int:
+        return len(self._files)
+
+    @staticmethod
+    def _build(names: Iterable[str]) -> Dict[str, str]:
+        files: Dict[str, str] = {}
+        for name in names:
+            stem, ext = os.path.splitext(name)
+            ext = ext.lower()
+            if ext not in _RANK:
+                continue
+            current = files.get(stem)
+            if current is None or _RANK[ext] < _RANK[os.path.splitext(current)[1].lower()]:
+                files[stem] = name
+        return files
+
+    def rebuild(self, names: Optional[Iterable[str]] = None) -> Dict[str, int]:
+        """Replace the index with names (or a fresh listing); returns what changed."""
+        if names is None:
+            names = os.listdir(self.folder)
+        files = self._build(names)
+        with self._lock:
+            old = self._files
+            # A download may have finished after names was listed; keep it if it's really there.
+            for video_id in [k for k in old if k not in files]:
+                filename = self._probe(video_id)
+                if filename:
+                    files[video_id] = filename
+            repairs = {
+                "added": sum(1 for k in files if k not in old),
+                "removed": sum(1 for k in old if k not in files),
+                "changed": sum(1 for k, v in files.items() if k in old and old[k] != v),
+            }
+            self._files = files
+            self.ready = True
+        return repairs
+
+    def verify(self) -> Dict[str, int]:
+        """Re-list the folder and repair the index; logs if anything was out of sync."""
+        repairs = self.rebuild()
+        if any(repairs.values()):
+            logger.info("File index repaired: %s", repairs)
+        return repairs
+
+    def refresh(self, video_id: str) -> Optional[str]:
+        """Re-probe one video on disk, update its entry and return its path."""
+        filename = self._probe(video_id)
+        with self._lock:
+            if filename:
+                self._files[video_id] = filename
+            else:
+                self._files.pop(video_id, None)
+        return str(self.folder / filename) if filename else None
+
+    def watch(self) -> bool:
+        """Follow changes with inotify (Linux only); returns False if unavailable."""
+        if self._watch_thread is not None:
+            return True
+        libc_name = ctypes.util.find_library("c")
+        try:
+            libc = ctypes.CDLL(libc_name, use_errno=True)
+            fd = libc.inotify_init1(os.O_CLOEXEC)
+            if fd < 0:
+                raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+            mask = _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE
+            if libc.inotify_add_watch(fd, str(self.folder).encode(), mask) < 0:
+                os.close(fd)
+                raise OSError(ctypes.get_errno(), "inotify_add_watch failed")
+        except (OSError, AttributeError, TypeError) as e:
+            logger.warning("inotify unavailable, file index relies on periodic checks: %s", e)
+            return False
+        self._watch_thread = threading.Thread(
+            target=self._watch_loop, args=(fd,), name="file-index-watch", daemon=True
+        )
+        self._watch_thread.start()
+        logger.info("Watching %s for file changes", self.folder)
+        return True
+
+    def _watch_loop(self, fd: int) -> None:
+        while True:
+            try:
+                data = os.read(fd, 64 * 1024)
+            except OSError:
+                logger.exception("inotify read failed, stopping file watch")
+                return
+            offset = 0
+            while offset + _IN_EVENT.size <= len(data):
+                _, _, _, name_len = _IN_EVENT.unpack_from(data, offset)
+                offset += _IN_EVENT.size
+                name = data[offset:offset + name_len].rstrip(b"\0").decode(errors="replace")
+                offset += name_len
+                stem, ext = os.path.splitext(name)
+                if ext.lower() in _RANK:
+                    self.refresh(stem)
+
+
+_indexes: Dict[Path, FileIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_file_index(download_folder_path: Path) -> FileIndex:
+    """Return the shared FileIndex for download_folder_path, creating it on first use."""
+    key = Path(download_folder_path).resolve()
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = FileIndex(download_folder_path)
+            _indexes[key] = index
+        return index
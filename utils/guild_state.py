@@ -1,13 +1,233 @@
 import asyncio
+import random
+import sys
+import time
+from collections import OrderedDict, deque
+from itertools import islice
+from typing import Callable, Dict, Iterator, List, Optional
+
 import discord
-from typing import Dict, List, Optional, Any
 
-guild_queues: Dict[int, List[Dict[str, Any]]] = {}
-guild_voice_clients: Dict[int, discord.VoiceClient] = {}
-guild_locks: Dict[int, asyncio.Lock] = {}
+
+class QueueEntry:
+    """One queued song. stream_url/http_headers/acodec are set while it is streamed during download.
+
+    span is the tracing span of the !play that queued it, if it is to be traced up to first audio.
+    """
+
+    __slots__ = ("title", "url", "id", "source", "requested_at", "stream_url", "http_headers", "acodec", "span")
+
+    def __init__(
+        self,
+        title: str,
+        url: str,
+        video_id: str,
+        source: str = "cached",
+        requested_at: Optional[float] = None,
+    ):
+        self.title = title
+        self.url = url
+        self.id = video_id
+        self.source = source
+        self.requested_at = requested_at
+        self.stream_url: Optional[str] = None
+        self.http_headers: Optional[Dict[str, str]] = None
+        self.acodec: Optional[str] = None
+        self.span = None
+
+    def __repr__(self) -> str:
+        return f"QueueEntry({self.id!r}, {self.title!r})"
+
+
+class SongQueue:
+    """A guild's play queue: O(1) dequeue/append, kept in the song_guilds index.
+
+    Mutate it only while holding the guild's get_guild_lock().
+    """
+
+    def __init__(self, guild_id: int):
+        self.guild_id = guild_id
+        self._entries: deque = deque()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __iter__(self) -> Iterator[QueueEntry]:
+        return iter(self._entries)
+
+    def __getitem__(self, index: int) -> QueueEntry:
+        return self._entries[index]
+
+    def head(self, n: int) -> list:
+        return list(islice(self._entries, n))
+
+    def append(self, entry: QueueEntry) -> None:
+        self._entries.append(entry)
+        _index_add(entry.id, self.guild_id)
+
+    def insert(self, index: int, entry: QueueEntry) -> None:
+        self._entries.insert(index, entry)
+        _index_add(entry.id, self.guild_id)
+
+    def popleft(self) -> QueueEntry:
+        entry = self._entries.popleft()
+        _index_discard(entry.id, self.guild_id)
+        return entry
+
+    def remove_id(self, video_id: str) -> int:
+        """Drop every entry for video_id; returns how many were removed."""
+        count = song_guilds.get(video_id, {}).get(self.guild_id, 0)
+        if count:
+            self._entries = deque(e for e in self._entries if e.id != video_id)
+            _index_discard(video_id, self.guild_id, count)
+        return count
+
+    def shuffle(self) -> None:
+        entries = list(self._entries)
+        random.shuffle(entries)
+        self._entries = deque(entries)
+
+    def clear(self) -> None:
+        for entry in self._entries:
+            _index_discard(entry.id, self.guild_id)
+        self._entries.clear()
+
+
+class GuildStateManager:
+    """Per-guild queues, voice clients and locks with bounded lifetime.
+
+    Guilds untouched for idle_ttl seconds are dropped by evict_idle(), which
+    then also drops the least recently used ones while more than max_guilds
+    are tracked. A guild with a connected voice client, queued songs or a lock
+    that is held or waited on is never evicted.
+    """
+
+    def __init__(self, idle_ttl: float = 3600, max_guilds: int = 1000):
+        self.idle_ttl = idle_ttl
+        self.max_guilds = max_guilds
+        self.queues: Dict[int, SongQueue] = {}
+        self.voice_clients: Dict[int, discord.VoiceClient] = {}
+        self.locks: Dict[int, asyncio.Lock] = {}
+        self._last_used: "OrderedDict[int, float]" = OrderedDict()
+        self.evicted_idle = 0
+        self.evicted_lru = 0
+        self.peak_guilds = 0
+        self._listeners: List[Callable[[int], None]] = []
+
+    def configure(self, idle_ttl: float, max_guilds: int) -> None:
+        self.idle_ttl = idle_ttl
+        self.max_guilds = max_guilds
+
+    def add_listener(self, callback: Callable[[int], None]) -> None:
+        """Call callback(guild_id) after a guild is evicted, to drop state kept elsewhere."""
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback: Callable[[int], None]) -> None:
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def touch(self, guild_id: int) -> None:
+        self._last_used[guild_id] = time.monotonic()
+        self._last_used.move_to_end(guild_id)
+        self.peak_guilds = max(self.peak_guilds, len(self._last_used))
+
+    def is_busy(self, guild_id: int) -> bool:
+        vc = self.voice_clients.get(guild_id)
+        if vc is not None and vc.is_connected():
+            return True
+        if self.queues.get(guild_id):
+            return True
+        lock = self.locks.get(guild_id)
+        # A released lock still has waiters until the woken one reacquires it.
+        return lock is not None and (lock.locked() or bool(lock._waiters))
+
+    def evict(self, guild_id: int) -> None:
+        self.queues.pop(guild_id, None)
+        self.voice_clients.pop(guild_id, None)
+        self.locks.pop(guild_id, None)
+        self._last_used.pop(guild_id, None)
+        for callback in self._listeners:
+            callback(guild_id)
+
+    def _evict_lru(self) -> int:
+        evicted = 0
+        for guild_id in list(self._last_used):
+            if len(self._last_used) <= self.max_guilds:
+                break
+            if not self.is_busy(guild_id):
+                self.evict(guild_id)
+                evicted += 1
+        self.evicted_lru += evicted
+        return evicted
+
+    def evict_idle(self) -> int:
+        """Drop guilds idle for longer than idle_ttl, then the least recently used
+        beyond max_guilds; returns how many were evicted."""
+        evicted = 0
+        if self.idle_ttl > 0:
+            cutoff = time.monotonic() - self.idle_ttl
+            for guild_id, last_used in list(self._last_used.items()):
+                if last_used > cutoff:
+                    break
+                if not self.is_busy(guild_id):
+                    self.evict(guild_id)
+                    evicted += 1
+            self.evicted_idle += evicted
+        if self.max_guilds and len(self._last_used) > self.max_guilds:
+            evicted += self._evict_lru()
+        return evicted
+
+    def stats(self) -> Dict[str, int]:
+        entries = sum(len(q) for q in self.queues.values())
+        return {
+            "guilds": len(self._last_used),
+            "peak_guilds": self.peak_guilds,
+            "queues": len(self.queues),
+            "locks": len(self.locks),
+            "voice_clients": len(self.voice_clients),
+            "queued_songs": entries,
+            "indexed_songs": len(song_guilds),
+            "approx_bytes": (
+                sys.getsizeof(self.queues) + sys.getsizeof(self.locks)
+                + sys.getsizeof(self.voice_clients) + sys.getsizeof(self._last_used)
+                + sum(sys.getsizeof(q._entries) for q in self.queues.values())
+                + entries * sys.getsizeof(QueueEntry("", "", ""))
+                + sys.getsizeof(song_guilds)
+            ),
+            "evicted_idle": self.evicted_idle,
+            "evicted_lru": self.evicted_lru,
+        }
+
+
+manager = GuildStateManager()
+# Kept as module attributes for callers that iterate them directly.
+guild_queues = manager.queues
+guild_voice_clients = manager.voice_clients
+guild_locks = manager.locks
+# video ID -> {guild ID: number of times it is queued there}
+song_guilds: Dict[str, Dict[int, int]] = {}
+
+
+def _index_add(video_id: str, guild_id: int) -> None:
+    guilds = song_guilds.setdefault(video_id, {})
+    guilds[guild_id] = guilds.get(guild_id, 0) + 1
+
+
+def _index_discard(video_id: str, guild_id: int, count: int = 1) -> None:
+    guilds = song_guilds.get(video_id)
+    if guilds is None:
+        return
+    remaining = guilds.get(guild_id, 0) - count
+    if remaining > 0:
+        guilds[guild_id] = remaining
+    else:
+        guilds.pop(guild_id, None)
+        if not guilds:
+            del song_guilds[video_id]
 
 
 def get_guild_lock(guild_id: int) -> asyncio.Lock:
+    manager.touch(guild_id)
     lock = guild_locks.get(guild_id)
     if lock is None:
         lock = asyncio.Lock()
@@ -15,11 +235,25 @@ def get_guild_lock(guild_id: int) -> asyncio.Lock:
     return lock
 
 
-def get_queue(guild_id: int) -> List[Dict[str, Any]]:
-    return guild_queues.setdefault(guild_id, [])
+def get_queue(guild_id: int) -> SongQueue:
+    manager.touch(guild_id)
+    queue = guild_queues.get(guild_id)
+    if queue is None:
+        queue = guild_queues[guild_id] = SongQueue(guild_id)
+    return queue
+
+
+async def remove_song_everywhere(video_id: str) -> int:
+    """Remove video_id from every queue it is in, visiting only those guilds."""
+    removed = 0
+    for guild_id in list(song_guilds.get(video_id, {})):
+        async with get_guild_lock(guild_id):
+            removed += get_queue(guild_id).remove_id(video_id)
+    return removed
 
 
 def set_voice_client(guild_id: int, vc: Optional[discord.VoiceClient]) -> None:
+    manager.touch(guild_id)
     if vc is None:
         guild_voice_clients.pop(guild_id, None)
     else:
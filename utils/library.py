@@ -1,14 +1,21 @@
 import os
 import json
+import random
 import logging
 import tempfile
+import threading
+import time
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple
 
-import yt_dlp
+from utils import tracing
+from utils.file_index import SUPPORTED_EXTENSIONS, get_file_index
+from utils.metadata import MetadataResolver
 
 logger = logging.getLogger("newBaldy.library")
 
+
 def load_library(library_path: Path) -> Dict[str, Any]:
     if not library_path.exists():
         return {}
@@ -19,91 +26,491 @@ def load_library(library_path: Path) -> Dict[str, Any]:
         logger.exception("Failed to read library file: %s", e)
         return {}
 
-def save_library(library: Dict[str, Any], library_path: Path) -> None:
+def save_library(library: Dict[str, Any], library_path: Path) -> bool:
     try:
         with tempfile.NamedTemporaryFile(
             "w", delete=False, dir=str(library_path.parent), encoding="utf-8"
         ) as tf:
             json.dump(library, tf, indent=4, ensure_ascii=False)
+            tf.flush()
+            # Compaction drops journal entries once this returns, so the snapshot must be on disk.
+            os.fsync(tf.fileno())
             tempname = tf.name
         os.replace(tempname, str(library_path))
+        return True
     except Exception:
         logger.exception("Failed to write library file")
+        return False
+
+
+class BaseLibraryStore:
+    """Song library API shared by the JSON and SQLite backends.
+
+    Records are the dicts update_song_library writes, keyed by video ID.
+    Backends implement storage; put, sample and search have defaults built
+    on the other methods.
+    """
+
+    def __init__(self, library_path: Path):
+        self.library_path = library_path
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def __contains__(self, song_id: str) -> bool:
+        raise NotImplementedError
+
+    def get(self, song_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def values(self) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        raise NotImplementedError
+
+    def head(self, count: int) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def sample(self, count: int) -> List[Dict[str, Any]]:
+        songs = self.values()
+        return random.sample(songs, min(count, len(songs)))
+
+    def search(self, query: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """Return songs whose title contains query, best matches first."""
+        query_lower = query.lower().strip()
+        if not query_lower:
+            return []
+        ranked = []
+        for song in self.values():
+            title = song.get("title", "").lower()
+            pos = title.find(query_lower)
+            if pos == -1:
+                continue
+            ranked.append(((title != query_lower, pos, len(title)), song))
+        ranked.sort(key=lambda item: item[0])
+        return [song for _, song in ranked[:limit]]
+
+    def put(self, song_id: str, record: Dict[str, Any]) -> None:
+        self.put_many({song_id: record})
+
+    def put_many(self, records: Dict[str, Dict[str, Any]]) -> None:
+        raise NotImplementedError
+
+    def remove(self, song_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+
+class LibraryStore(BaseLibraryStore):
+    """In-memory view of song_library.json shared by the whole process.
+
+    The file is parsed once and reads are served from memory. Each access
+    compares the file's mtime/size with what was last seen so edits made
+    outside the bot are picked up without restarting.
+
+    Writes never rewrite the whole file. Every add or remove is appended as
+    one JSON line to song_library.journal, which is replayed on load and
+    folded back into the snapshot by a background thread once it grows past
+    compact_threshold bytes.
+    """
+
+    def __init__(self, library_path: Path, compact_threshold: int = 1 << 20):
+        super().__init__(library_path)
+        self.journal_path = library_path.with_suffix(".journal")
+        self.compact_threshold = compact_threshold
+        self._songs: Dict[str, Dict[str, Any]] = {}
+        self._signature: Optional[Tuple[int, int]] = None
+        self._loaded = False
+        self._journal = None
+        self._journal_size = 0
+        self._compacting = False
+
+    def _stat_signature(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = self.library_path.stat()
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _refresh(self) -> None:
+        if self._compacting and self._loaded:
+            return
+        signature = self._stat_signature()
+        if self._loaded and signature == self._signature:
+            return
+        if self._loaded:
+            logger.info("Library file changed on disk, reloading %s", self.library_path)
+        self._songs = load_library(self.library_path)
+        self._journal_size = self._replay_journal()
+        self._signature = signature
+        self._loaded = True
+        self._maybe_compact()
+
+    def _replay_journal(self) -> int:
+        try:
+            with self.journal_path.open("rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return 0
+        replayed = 0
+        for line in data.splitlines():
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning("Skipping corrupt library journal line in %s", self.journal_path)
+                continue
+            if entry.get("op") == "put":
+                self._songs[entry["id"]] = entry["record"]
+            elif entry.get("op") == "del":
+                self._songs.pop(entry["id"], None)
+            replayed += 1
+        if replayed:
+            logger.info("Replayed %d library journal entries", replayed)
+        complete = data.rfind(b"\n") + 1
+        if complete < len(data):
+            # A write cut short by a crash; drop it so appends start on a fresh line.
+            logger.warning("Dropping %d bytes of incomplete library journal entry", len(data) - complete)
+            os.truncate(self.journal_path, complete)
+        return complete
+
+    def _append(self, entries: List[Dict[str, Any]]) -> None:
+        """Write entries to the journal and fsync; raises if they didn't make it to disk.
+
+        Callers change self._songs only after this returns, so a returned
+        put/remove is durable and a failed one leaves memory untouched.
+        """
+        if self._journal is None:
+            self._journal = self.journal_path.open("ab")
+        data = "".join(
+            json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries
+        ).encode("utf-8")
+        try:
+            self._journal.write(data)
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+        except Exception:
+            logger.exception("Failed to append to library journal")
+            self._truncate_journal()
+            raise
+        self._journal_size += len(data)
+
+    def _truncate_journal(self) -> None:
+        # Cut a partly written batch so the next append doesn't land on a half line.
+        journal, self._journal = self._journal, None
+        try:
+            journal.close()
+        except Exception:
+            pass
+        try:
+            os.truncate(self.journal_path, self._journal_size)
+        except OSError:
+            logger.exception("Failed to truncate library journal to %d bytes", self._journal_size)
+
+    def _maybe_compact(self) -> None:
+        if self._journal_size >= self.compact_threshold and not self._compacting:
+            self._compacting = True
+            threading.Thread(
+                target=self._compact, name="library-compaction", daemon=True
+            ).start()
+
+    def _compact(self) -> None:
+        """Write a fresh snapshot and drop the journal entries it now contains."""
+        try:
+            with self._lock:
+                songs = dict(self._songs)
+                offset = self._journal_size
+            if not save_library(songs, self.library_path):
+                return
+            with self._lock:
+                if self._journal is not None:
+                    self._journal.close()
+                    self._journal = None
+                with self.journal_path.open("rb") as f:
+                    f.seek(offset)
+                    tail = f.read()
+                tmp_path = self.journal_path.with_suffix(".journal.tmp")
+                with tmp_path.open("wb") as f:
+                    f.write(tail)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.journal_path)
+                self._journal_size = len(tail)
+                self._signature = self._stat_signature()
+            logger.info("Compacted library journal into %s (%d songs)", self.library_path, len(songs))
+        except Exception:
+            logger.exception("Library journal compaction failed")
+        finally:
+            self._compacting = False
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._refresh()
+            return len(self._songs)
+
+    def __contains__(self, song_id: str) -> bool:
+        with self._lock:
+            self._refresh()
+            return song_id in self._songs
+
+    def get(self, song_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._refresh()
+            return self._songs.get(song_id)
+
+    def values(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            self._refresh()
+            return list(self._songs.values())
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            self._refresh()
+            return dict(self._songs)
+
+    def head(self, count: int) -> List[Dict[str, Any]]:
+        with self._lock:
+            self._refresh()
+            return [song for _, song in zip(range(count), self._songs.values())]
+
+    def put_many(self, records: Dict[str, Dict[str, Any]]) -> None:
+        if not records:
+            return
+        with self._lock:
+            self._refresh()
+            self._append([
+                {"op": "put", "id": song_id, "record": record}
+                for song_id, record in records.items()
+            ])
+            self._songs.update(records)
+            self._maybe_compact()
+
+    def remove(self, song_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._refresh()
+            record = self._songs.get(song_id)
+            if record is not None:
+                self._append([{"op": "del", "id": song_id}])
+                del self._songs[song_id]
+                self._maybe_compact()
+            return record
+
+
+_stores: Dict[Path, BaseLibraryStore] = {}
+_stores_lock = threading.Lock()
+
+def _open_store(library_path: Path, backend: str) -> BaseLibraryStore:
+    if backend == "sqlite":
+        try:
+            from utils.library_db import SqliteLibraryStore
+            return SqliteLibraryStore(library_path)
+        except Exception:
+            logger.exception("Could not open SQLite library, falling back to JSON")
+    return LibraryStore(library_path)
+
+def get_library_store(library_path: Path, backend: Optional[str] = None) -> BaseLibraryStore:
+    """Return the shared store for library_path, creating it on first use.
+
+    backend only matters for the first call; the bot opens the store with the
+    configured backend at startup and everything else reuses it.
+    """
+    key = Path(library_path).resolve()
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _open_store(key, backend or "json")
+            _stores[key] = store
+        return store
 
 def update_song_library(
     song_info: Dict[str, Any],
     library_path: Path,
     download_folder: str,
 ) -> None:
-    library = load_library(library_path)
     song_id = song_info.get("id")
     if not song_id:
         logger.warning("update_song_library called without id")
         return
 
-    library[song_id] = {
-        "title": song_info.get("title", "Unknown Title"),
-        "duration": song_info.get("duration", 0),
-        "uploader": song_info.get("uploader", "Unknown Uploader"),
-        "filename": str(Path(download_folder) / f"{song_id}.webm"),
-        "url": f"https://www.youtube.com/watch?v={song_id}",
-        "download_date": song_info.get("download_date", ""),
-    }
-    save_library(library, library_path)
+    with tracing.span("library_save", song=song_id):
+        get_library_store(library_path).put(song_id, {
+            "title": song_info.get("title", "Unknown Title"),
+            "duration": song_info.get("duration", 0),
+            "uploader": song_info.get("uploader", "Unknown Uploader"),
+            "filename": str(Path(download_folder) / f"{song_id}.webm"),
+            "url": f"https://www.youtube.com/watch?v={song_id}",
+            "download_date": song_info.get("download_date", ""),
+        })
+
+@dataclass
+class ScanResult:
+    files: int = 0
+    added: int = 0
+    changed: int = 0
+    deleted: int = 0
+    indexed: int = 0
+    unavailable: int = 0
+    pruned: int = 0
+    list_seconds: float = 0.0
+    resolve_seconds: float = 0.0
+    total_seconds: float = 0.0
+
+    def summary(self) -> str:
+        return (
+            f"{self.files} files ({self.added} added, {self.changed} changed, "
+            f"{self.deleted} deleted). Indexed {self.indexed} new songs, "
+            f"{self.unavailable} unavailable, pruned {self.pruned}. "
+            f"Listing {self.list_seconds:.2f}s, metadata {self.resolve_seconds:.2f}s, "
+            f"total {self.total_seconds:.2f}s."
+        )
+
+_scan_lock = threading.Lock()
+
+def scan_snapshot_path(library_path: Path) -> Path:
+    return library_path.parent / "scan_snapshot.json"
+
+def _list_download_folder(download_folder_path: Path) -> Dict[str, List[int]]:
+    files: Dict[str, List[int]] = {}
+    with os.scandir(download_folder_path) as entries:
+        for entry in entries:
+            if Path(entry.name).suffix.lower() not in SUPPORTED_EXTENSIONS:
+                continue
+            try:
+                if not entry.is_file():
+                    continue
+                st = entry.stat()
+            except FileNotFoundError:
+                continue
+            files[entry.name] = [st.st_size, st.st_mtime_ns, st.st_ino]
+    return files
+
+def _load_scan_snapshot(snapshot_path: Path) -> Dict[str, List[int]]:
+    try:
+        with snapshot_path.open("r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (json.JSONDecodeError, OSError):
+        logger.warning("Ignoring unreadable scan snapshot %s", snapshot_path)
+        return {}
+
+def _save_scan_snapshot(files: Dict[str, List[int]], snapshot_path: Path) -> None:
+    try:
+        with tempfile.NamedTemporaryFile(
+            "w", delete=False, dir=str(snapshot_path.parent), encoding="utf-8"
+        ) as tf:
+            # dumps() uses the C encoder; dump() streams through the pure-Python one.
+            tf.write(json.dumps(files, separators=(",", ":")))
+            tempname = tf.name
+        os.replace(tempname, str(snapshot_path))
+    except Exception:
+        logger.exception("Failed to write scan snapshot")
 
 def scan_and_update_library(
     download_folder_path: Path,
     library_path: Path,
     download_folder: str,
-) -> None:
-    """Scan download folder and index any songs missing from the library."""
+    full: bool = False,
+    resolver: Optional[MetadataResolver] = None,
+    checkpoint_every: int = 25,
+    snapshot_interval: float = 10.0,
+) -> Optional[ScanResult]:
+    """Index files added since the last scan and prune songs whose files are gone.
+
+    The files seen (name, size, mtime, inode) are saved to scan_snapshot.json
+    next to the library, so a restart only looks at what changed. full=True
+    ignores the snapshot and re-checks every file and every library entry.
+    Metadata is fetched in parallel by resolver; resolved songs are written
+    every checkpoint_every results and the snapshot at most every
+    snapshot_interval seconds (it is rewritten whole), so an interrupted
+    scan resumes close to where it stopped. Returns None if another scan is
+    running.
+    """
+    if not _scan_lock.acquire(blocking=False):
+        logger.info("Library scan already running, skipping.")
+        return None
+    result = ScanResult()
+    started = time.perf_counter()
     try:
-        library = load_library(library_path)
-        supported_extensions = {".webm", ".m4a", ".mp3", ".opus", ".mp4"}
-        downloaded_files = [
-            f for f in os.listdir(download_folder_path)
-            if Path(f).suffix.lower() in supported_extensions
-        ]
-        new_songs_count = 0
-
-        for filename in downloaded_files:
-            song_id = Path(filename).stem
-            if song_id in library:
+        library = get_library_store(library_path)
+        resolver = resolver or MetadataResolver()
+        snapshot_path = scan_snapshot_path(library_path)
+        previous = {} if full else _load_scan_snapshot(snapshot_path)
+
+        current = _list_download_folder(download_folder_path)
+        get_file_index(download_folder_path).rebuild(current)
+        result.files = len(current)
+        result.list_seconds = time.perf_counter() - started
+
+        to_check = [name for name, stat in current.items() if previous.get(name) != stat]
+        result.added = sum(1 for name in to_check if name not in previous)
+        result.changed = len(to_check) - result.added
+        deleted = [name for name in previous if name not in current]
+        result.deleted = len(deleted)
+
+        # Prune before resolving so an interrupted scan doesn't forget deletions.
+        present_ids = {Path(name).stem for name in current}
+        if full:
+            gone_ids = set(library.snapshot()) - present_ids
+        else:
+            gone_ids = {Path(name).stem for name in deleted} - present_ids
+        for song_id in gone_ids:
+            if any((download_folder_path / f"{song_id}{ext}").exists() for ext in SUPPORTED_EXTENSIONS):
                 continue
+            if library.remove(song_id) is not None:
+                result.pruned += 1
 
-            video_url = f"https://www.youtube.com/watch?v={song_id}"
-            try:
-                ydl_opts = {
-                    "quiet": True,
-                    "no_warnings": True,
-                    "no_color": True,
-                }
-                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                    video_info = ydl.extract_info(video_url, download=False)
-
-                library[song_id] = {
-                    "title": video_info.get("title", "Unknown Title"),
-                    "duration": video_info.get("duration", 0),
-                    "uploader": video_info.get("uploader", "Unknown Uploader"),
-                    "filename": str(Path(download_folder) / filename),
-                    "url": video_url,
-                    "download_date": "",
-                }
-                new_songs_count += 1
-
-            except yt_dlp.utils.DownloadError:
-                logger.warning("Song %s is no longer available on YouTube, flagging to skip.", song_id)
-                library[song_id] = {
-                    "title": "Unavailable",
-                    "filename": str(Path(download_folder) / filename),
-                    "url": video_url,
-                    "unavailable": True,
-                }
-
-            except Exception as e:
-                logger.exception("Error processing song %s: %s", song_id, e)
-
-        save_library(library, library_path)
-        logger.info("Library scan complete. Added %d new songs.", new_songs_count)
+        pending: Dict[str, str] = {}
+        for filename in to_check:
+            song_id = Path(filename).stem
+            if song_id not in pending and song_id not in library:
+                pending[song_id] = filename
+        unresolved = set(pending.values())
+        failed = set()
+        batch: Dict[str, Dict[str, Any]] = {}
+        last_snapshot = time.monotonic()
+
+        def _checkpoint(final: bool = False) -> None:
+            nonlocal last_snapshot
+            library.put_many(batch)
+            batch.clear()
+            if not final and time.monotonic() - last_snapshot < snapshot_interval:
+                return
+            last_snapshot = time.monotonic()
+            # Unresolved and failed files stay out of the snapshot so the next scan retries them.
+            _save_scan_snapshot(
+                {
+                    name: stat for name, stat in current.items()
+                    if name not in unresolved and name not in failed
+                },
+                snapshot_path,
+            )
+
+        def _on_result(song_id: str, filename: str, record: Optional[Dict[str, Any]]) -> None:
+            unresolved.discard(filename)
+            if record is None:
+                failed.add(filename)
+            else:
+                batch[song_id] = record
+                if record.get("unavailable"):
+                    result.unavailable += 1
+                else:
+                    result.indexed += 1
+            if len(batch) >= checkpoint_every:
+                _checkpoint()
+
+        resolve_started = time.perf_counter()
+        if pending:
+            logger.info("Resolving metadata for %d new files with %d workers", len(pending), resolver.workers)
+        resolver.resolve_many(pending.items(), download_folder, _on_result)
+        result.resolve_seconds = time.perf_counter() - resolve_started
+
+        _checkpoint(final=True)
+        result.total_seconds = time.perf_counter() - started
+        logger.info("Library scan complete. %s", result.summary())
+        return result
     except Exception:
         logger.exception("Error during library scan")
+        return None
+    finally:
+        _scan_lock.release()
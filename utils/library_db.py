@@ -0,0 +1,163 @@
+import json
+import logging
+import re
+import sqlite3
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+from utils.library import BaseLibraryStore, load_library
+
+logger = logging.getLogger("newBaldy.library_db")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS songs (
+    id TEXT PRIMARY KEY,
+    title TEXT NOT NULL DEFAULT '',
+    uploader TEXT NOT NULL DEFAULT '',
+    record TEXT NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS songs_fts USING fts5(
+    title, uploader,
+    content='songs', content_rowid='rowid',
+    tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS songs_ai AFTER INSERT ON songs BEGIN
+    INSERT INTO songs_fts(rowid, title, uploader) VALUES (new.rowid, new.title, new.uploader);
+END;
+CREATE TRIGGER IF NOT EXISTS songs_ad AFTER DELETE ON songs BEGIN
+    INSERT INTO songs_fts(songs_fts, rowid, title, uploader)
+    VALUES ('delete', old.rowid, old.title, old.uploader);
+END;
+CREATE TRIGGER IF NOT EXISTS songs_au AFTER UPDATE ON songs BEGIN
+    INSERT INTO songs_fts(songs_fts, rowid, title, uploader)
+    VALUES ('delete', old.rowid, old.title, old.uploader);
+    INSERT INTO songs_fts(rowid, title, uploader) VALUES (new.rowid, new.title, new.uploader);
+END;
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+_UPSERT = """
+INSERT INTO songs (id, title, uploader, record) VALUES (?, ?, ?, ?)
+ON CONFLICT(id) DO UPDATE SET
+    title = excluded.title, uploader = excluded.uploader, record = excluded.record
+"""
+
+
+def _row(song_id: str, record: Dict[str, Any]) -> tuple:
+    return (
+        song_id,
+        record.get("title", ""),
+        record.get("uploader", ""),
+        json.dumps(record, ensure_ascii=False),
+    )
+
+
+def _fts_query(query: str) -> Optional[str]:
+    tokens = re.findall(r"\w+", query.lower())
+    if not tokens:
+        return None
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+class SqliteLibraryStore(BaseLibraryStore):
+    """SQLite-backed song library with an FTS5 index over title and uploader.
+
+    Records are stored as the same JSON dicts update_song_library writes, so
+    callers can't tell the backends apart. The database lives next to
+    song_library.json and imports it automatically the first time it is opened.
+    """
+
+    def __init__(self, library_path: Path):
+        super().__init__(library_path)
+        self.db_path = library_path.with_suffix(".sqlite3")
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._import_json()
+
+    def _import_json(self) -> None:
+        with self._lock, self._conn:
+            imported = self._conn.execute(
+                "SELECT value FROM meta WHERE key = 'json_imported'"
+            ).fetchone()
+            if imported:
+                return
+            library = load_library(self.library_path)
+            self._conn.executemany(_UPSERT, [_row(k, v) for k, v in library.items()])
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('json_imported', ?)",
+                (str(len(library)),),
+            )
+        if library:
+            logger.info("Imported %d songs from %s into %s", len(library), self.library_path, self.db_path)
+
+    def _records(self, sql: str, params: tuple = ()) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM songs").fetchone()[0]
+
+    def __contains__(self, song_id: str) -> bool:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM songs WHERE id = ?", (song_id,)
+            ).fetchone() is not None
+
+    def get(self, song_id: str) -> Optional[Dict[str, Any]]:
+        records = self._records("SELECT record FROM songs WHERE id = ?", (song_id,))
+        return records[0] if records else None
+
+    def values(self) -> List[Dict[str, Any]]:
+        return self._records("SELECT record FROM songs ORDER BY rowid")
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute("SELECT id, record FROM songs ORDER BY rowid").fetchall()
+        return {song_id: json.loads(record) for song_id, record in rows}
+
+    def head(self, count: int) -> List[Dict[str, Any]]:
+        return self._records("SELECT record FROM songs ORDER BY rowid LIMIT ?", (count,))
+
+    def sample(self, count: int) -> List[Dict[str, Any]]:
+        return self._records("SELECT record FROM songs ORDER BY random() LIMIT ?", (count,))
+
+    def search(self, query: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """Ranked full-text search; falls back to a substring match on title."""
+        fts_query = _fts_query(query)
+        if fts_query is None:
+            return []
+        records = self._records(
+            "SELECT s.record FROM songs_fts f JOIN songs s ON s.rowid = f.rowid "
+            "WHERE songs_fts MATCH ? ORDER BY bm25(songs_fts, 10.0, 1.0) LIMIT ?",
+            (fts_query, limit),
+        )
+        if records:
+            return records
+        return self._records(
+            "SELECT record FROM songs WHERE instr(lower(title), ?) > 0 "
+            "ORDER BY instr(lower(title), ?), length(title) LIMIT ?",
+            (query.lower().strip(), query.lower().strip(), limit),
+        )
+
+    def put_many(self, records: Dict[str, Dict[str, Any]]) -> None:
+        if not records:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany(_UPSERT, [_row(k, v) for k, v in records.items()])
+
+    def remove(self, song_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT record FROM songs WHERE id = ?", (song_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("DELETE FROM songs WHERE id = ?", (song_id,))
+        return json.loads(row[0])
@@ -0,0 +1,191 @@
+import logging
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, Any, Callable, Iterable, List, Optional, Tuple
+
+import yt_dlp
+
+from utils.youtube_api import get_youtube_client
+
+logger = logging.getLogger("newBaldy.metadata")
+
+VIDEOS_LIST_MAX_IDS = 50
+
+_ISO_DURATION = re.compile(
+    r"P(?:(?P<weeks>\d+)W)?(?:(?P<days>\d+)D)?"
+    r"(?:T(?:(?P<hours>\d+)H)?(?:(?P<minutes>\d+)M)?(?:(?P<seconds>\d+(?:\.\d+)?)S)?)?$"
+)
+
+
+def parse_iso8601_duration(value: str) -> int:
+    """Convert a YouTube contentDetails.duration such as 'PT4M13S' to seconds."""
+    match = _ISO_DURATION.match(value or "")
+    if not match:
+        return 0
+    parts = {k: float(v) for k, v in match.groupdict().items() if v}
+    return int(
+        parts.get("weeks", 0) * 604800
+        + parts.get("days", 0) * 86400
+        + parts.get("hours", 0) * 3600
+        + parts.get("minutes", 0) * 60
+        + parts.get("seconds", 0)
+    )
+
+
+def fetch_video_details(video_ids: List[str], youtube_api_key: str) -> Dict[str, Dict[str, Any]]:
+    """Look up up to 50 IDs with one videos.list call (1 quota unit).
+
+    videos.list rejects maxResults alongside id, so callers chunk IDs to
+    VIDEOS_LIST_MAX_IDS themselves. IDs missing from the result are deleted
+    or private. API errors (and QuotaExceeded) propagate so the caller can
+    fall back to yt_dlp.
+    """
+    items = get_youtube_client(youtube_api_key).videos(video_ids, label="scan")
+    return {
+        item["id"]: {
+            "title": item["snippet"].get("title", "Unknown Title"),
+            "uploader": item["snippet"].get("channelTitle", "Unknown Uploader"),
+            "duration": parse_iso8601_duration(item.get("contentDetails", {}).get("duration", "")),
+        }
+        for item in items
+    }
+
+
+class RateLimiter:
+    """Thread-safe token bucket; rate <= 0 disables limiting."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class MetadataResolver:
+    """Looks up video metadata for files found in the download folder.
+
+    With an API key, IDs are looked up 50 at a time through videos.list.
+    yt_dlp is only used for IDs whose batch failed, or for everything when
+    no key is set. Lookups run on a small thread pool, each worker thread
+    keeps its own YoutubeDL instance, and all of them share one rate limit.
+    """
+
+    def __init__(self, workers: int = 4, rate_limit: float = 2.0, youtube_api_key: Optional[str] = None):
+        self.workers = max(1, workers)
+        self.youtube_api_key = youtube_api_key
+        self.rate_limiter = RateLimiter(rate_limit, burst=self.workers)
+        self._local = threading.local()
+
+    def _ydl(self) -> yt_dlp.YoutubeDL:
+        ydl = getattr(self._local, "ydl", None)
+        if ydl is None:
+            ydl = yt_dlp.YoutubeDL({
+                "quiet": True,
+                "no_warnings": True,
+                "no_color": True,
+            })
+            self._local.ydl = ydl
+        return ydl
+
+    @staticmethod
+    def _record(song_id: str, filename: str, download_folder: str, info: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "title": info.get("title", "Unknown Title"),
+            "duration": info.get("duration", 0),
+            "uploader": info.get("uploader", "Unknown Uploader"),
+            "filename": str(Path(download_folder) / filename),
+            "url": f"https://www.youtube.com/watch?v={song_id}",
+            "download_date": "",
+        }
+
+    @staticmethod
+    def _unavailable(song_id: str, filename: str, download_folder: str) -> Dict[str, Any]:
+        logger.warning("Song %s is no longer available on YouTube, flagging to skip.", song_id)
+        return {
+            "title": "Unavailable",
+            "filename": str(Path(download_folder) / filename),
+            "url": f"https://www.youtube.com/watch?v={song_id}",
+            "unavailable": True,
+        }
+
+    def resolve(self, song_id: str, filename: str, download_folder: str) -> Optional[Dict[str, Any]]:
+        """Return a library record for song_id via yt_dlp, or None if the lookup failed."""
+        video_url = f"https://www.youtube.com/watch?v={song_id}"
+        self.rate_limiter.acquire()
+        try:
+            video_info = self._ydl().extract_info(video_url, download=False)
+            return self._record(song_id, filename, download_folder, video_info)
+
+        except yt_dlp.utils.DownloadError:
+            return self._unavailable(song_id, filename, download_folder)
+
+        except Exception as e:
+            logger.exception("Error processing song %s: %s", song_id, e)
+            return None
+
+    def resolve_batch(self, song_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Fetch title/uploader/duration for up to 50 IDs with one API call."""
+        self.rate_limiter.acquire()
+        return fetch_video_details(song_ids, self.youtube_api_key)
+
+    def resolve_many(
+        self,
+        items: Iterable[Tuple[str, str]],
+        download_folder: str,
+        on_result: Callable[[str, str, Optional[Dict[str, Any]]], None],
+    ) -> None:
+        """Resolve (song_id, filename) pairs in parallel.
+
+        on_result(song_id, filename, record) is called from the calling thread
+        as each lookup finishes, so callers can persist progress as they go.
+        """
+        items = list(items)
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="metadata") as pool:
+            fallback = items
+            if self.youtube_api_key:
+                fallback = []
+                chunks = [items[i:i + VIDEOS_LIST_MAX_IDS] for i in range(0, len(items), VIDEOS_LIST_MAX_IDS)]
+                batches = {
+                    pool.submit(self.resolve_batch, [song_id for song_id, _ in chunk]): chunk
+                    for chunk in chunks
+                }
+                for future in as_completed(batches):
+                    chunk = batches[future]
+                    try:
+                        details = future.result()
+                    except Exception as e:
+                        logger.warning("videos.list failed for %d IDs, falling back to yt_dlp: %s", len(chunk), e)
+                        fallback.extend(chunk)
+                        continue
+                    for song_id, filename in chunk:
+                        info = details.get(song_id)
+                        if info is None:
+                            on_result(song_id, filename, self._unavailable(song_id, filename, download_folder))
+                        else:
+                            on_result(song_id, filename, self._record(song_id, filename, download_folder, info))
+
+            futures = {
+                pool.submit(self.resolve, song_id, filename, download_folder): (song_id, filename)
+                for song_id, filename in fallback
+            }
+            for future in as_completed(futures):
+                song_id, filename = futures[future]
+                on_result(song_id, filename, future.result())
@@ -0,0 +1,263 @@
+import asyncio
+import bisect
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+from aiohttp import web
+
+logger = logging.getLogger("newBaldy.metrics")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+LAG_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+
+LabelValues = Tuple[str, ...]
+# A callback returns one value, or {label values: value} for labelled metrics.
+CallbackResult = Union[float, Dict[LabelValues, float]]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: LabelValues, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        lines.extend(f"{self.name}{_labels(self.labelnames, key)} {_number(v)}" for key, v in items)
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram, thread-safe so executor threads can observe."""
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> ([count per bucket] + [+Inf count], sum)
+        self._series: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            series[0][index] += 1
+            series[1][0] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((key, list(counts), total[0]) for key, (counts, total) in self._series.items())
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class CallbackMetric:
+    """Gauge or counter whose value is read from the bot's own state at scrape time."""
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        callback: Callable[[], CallbackResult],
+        kind: str = "gauge",
+        labelnames: Sequence[str] = (),
+    ):
+        self.name = name
+        self.help = help_text
+        self.callback = callback
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        try:
+            value = self.callback()
+        except Exception:
+            logger.exception("Metric callback %s failed", self.name)
+            return lines
+        if isinstance(value, dict):
+            for key, v in sorted(value.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, key)} {_number(v)}")
+        else:
+            lines.append(f"{self.name} {_number(value)}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, Union[Counter, Histogram, CallbackMetric]] = {}
+
+    def _register(self, metric):
+        existing = self._metrics.get(metric.name)
+        if isinstance(existing, (Counter, Histogram)):
+            return existing
+        # Callbacks are replaced so a reloaded cog points at its new state.
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help_text, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def callback(
+        self,
+        name: str,
+        help_text: str,
+        callback: Callable[[], CallbackResult],
+        kind: str = "gauge",
+        labelnames: Sequence[str] = (),
+    ) -> CallbackMetric:
+        return self._register(CallbackMetric(name, help_text, callback, kind, labelnames))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for name in sorted(self._metrics):
+            lines.extend(self._metrics[name].render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+COMMAND_LATENCY = registry.histogram(
+    "baldy_command_duration_seconds", "Time from command invoke to completion.", ("command", "outcome")
+)
+SEARCH_LATENCY = registry.histogram(
+    "baldy_search_duration_seconds", "Search provider call duration.", ("provider", "found")
+)
+DOWNLOAD_LATENCY = registry.histogram(
+    "baldy_download_duration_seconds", "Download and index duration per song.", ("outcome",)
+)
+LOOP_LAG = registry.histogram(
+    "baldy_event_loop_lag_seconds", "How late the event loop woke a periodic sleep.", buckets=LAG_BUCKETS
+)
+
+
+def executor_usage(executor: Optional[ThreadPoolExecutor]) -> Dict[str, int]:
+    """Threads, busy-or-queued work items and max workers of a ThreadPoolExecutor."""
+    if executor is None:
+        return {"max_workers": 0, "threads": 0, "queued": 0}
+    return {
+        "max_workers": getattr(executor, "_max_workers", 0),
+        "threads": len(getattr(executor, "_threads", ())),
+        "queued": executor._work_queue.qsize() if hasattr(executor, "_work_queue") else 0,
+    }
+
+
+def install_command_hooks(bot) -> None:
+    """Time every command through the bot's global before/after invoke hooks."""
+    started: Dict[int, float] = {}
+
+    @bot.before_invoke
+    async def _start_timer(ctx) -> None:
+        started[id(ctx)] = time.perf_counter()
+
+    @bot.after_invoke
+    async def _observe(ctx) -> None:
+        began = started.pop(id(ctx), None)
+        if began is not None and ctx.command is not None:
+            COMMAND_LATENCY.observe(
+                time.perf_counter() - began,
+                command=ctx.command.qualified_name,
+                outcome="error" if ctx.command_failed else "ok",
+            )
+
+
+class MetricsServer:
+    """Serves registry.render() at http://<host>:<port>/metrics and samples event loop lag."""
+
+    def __init__(self, port: int, host: str = "127.0.0.1", lag_interval: float = 0.5):
+        self.port = port
+        self.host = host
+        self.lag_interval = lag_interval
+        self._runner: Optional[web.AppRunner] = None
+        self._lag_task: Optional[asyncio.Task] = None
+        registry.callback(
+            "baldy_default_executor_threads",
+            "Threads and queued work items of the loop's default executor (asyncio.to_thread).",
+            lambda: {(k,): v for k, v in executor_usage(
+                getattr(asyncio.get_running_loop(), "_default_executor", None)
+            ).items()},
+            labelnames=("state",),
+        )
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        return web.Response(text=registry.render(), content_type="text/plain", charset="utf-8")
+
+    async def _sample_loop_lag(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.lag_interval
+            await asyncio.sleep(self.lag_interval)
+            LOOP_LAG.observe(max(0.0, loop.time() - expected))
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_get("/metrics", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        self._lag_task = asyncio.create_task(self._sample_loop_lag(), name="metrics-loop-lag")
+        logger.info("Serving metrics on http://%s:%d/metrics", self.host, self.port)
+
+    async def stop(self) -> None:
+        if self._lag_task is not None:
+            self._lag_task.cancel()
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
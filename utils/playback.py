@@ -0,0 +1,157 @@
+import logging
+import shlex
+import statistics
+import time
+from collections import OrderedDict, deque
+from pathlib import Path
+from typing import Callable, Dict, Any, Optional, Tuple
+
+import discord
+
+logger = logging.getLogger("newBaldy.playback")
+
+STREAM_BEFORE_OPTIONS = "-reconnect 1 -reconnect_streamed 1 -reconnect_delay_max 5"
+
+# Extensions whose audio is always Opus; .webm may also hold Vorbis and is probed.
+_OPUS_EXTENSIONS = {".opus", ".ogg"}
+_NON_OPUS_EXTENSIONS = {".m4a", ".mp3", ".mp4"}
+
+# (path, mtime_ns) -> (codec, bitrate); probing costs an ffprobe process per file.
+_probe_cache: "OrderedDict[Tuple[str, int], Tuple[Optional[str], Optional[int]]]" = OrderedDict()
+_PROBE_CACHE_SIZE = 2048
+
+
+async def probe_codec(path: str) -> Tuple[Optional[str], Optional[int]]:
+    """Return (codec, bitrate in kbps) of a local audio file, cached per mtime."""
+    suffix = Path(path).suffix.lower()
+    if suffix in _OPUS_EXTENSIONS:
+        return "opus", None
+    if suffix in _NON_OPUS_EXTENSIONS:
+        return None, None
+    try:
+        key = (path, Path(path).stat().st_mtime_ns)
+    except OSError:
+        key = (path, 0)
+    cached = _probe_cache.get(key)
+    if cached is not None:
+        _probe_cache.move_to_end(key)
+        return cached
+    try:
+        result = await discord.FFmpegOpusAudio.probe(path)
+    except Exception:
+        logger.exception("Failed to probe %s, falling back to transcoding", path)
+        result = (None, None)
+    _probe_cache[key] = result
+    if len(_probe_cache) > _PROBE_CACHE_SIZE:
+        _probe_cache.popitem(last=False)
+    return result
+
+
+async def create_audio_source(
+    source: str,
+    mode: str = "opus",
+    codec: Optional[str] = None,
+    before_options: Optional[str] = None,
+) -> discord.AudioSource:
+    """Build the AudioSource for a file path or stream URL.
+
+    mode "pcm" is the old FFmpegPCMAudio path, where discord.py encodes every
+    frame to Opus in Python. mode "opus" lets FFmpeg produce Opus itself and
+    copies the packets untouched when the source already is Opus. codec can
+    be passed for stream URLs (yt_dlp's acodec); files are probed.
+    """
+    if mode == "pcm":
+        return discord.FFmpegPCMAudio(source, before_options=before_options)
+    bitrate = None
+    if codec is None and before_options is None:
+        codec, bitrate = await probe_codec(source)
+    # FFmpegOpusAudio stream-copies for codec "opus" and encodes with libopus otherwise.
+    return discord.FFmpegOpusAudio(
+        source, codec=codec, bitrate=bitrate or 128, before_options=before_options,
+    )
+
+
+def stream_before_options(http_headers: Optional[Dict[str, str]] = None) -> str:
+    """FFmpeg input options for playing a resolved YouTube stream URL."""
+    if not http_headers:
+        return STREAM_BEFORE_OPTIONS
+    headers = "".join(f"{k}: {v}\r\n" for k, v in http_headers.items())
+    return f"{STREAM_BEFORE_OPTIONS} -headers {shlex.quote(headers)}"
+
+
+class FirstAudioTimer(discord.AudioSource):
+    """Wraps an AudioSource and reports when its first frame is read."""
+
+    def __init__(self, source: discord.AudioSource, on_first_audio: Callable[[float], None]):
+        self.source = source
+        self._on_first_audio = on_first_audio
+        self._fired = False
+
+    def read(self) -> bytes:
+        data = self.source.read()
+        if data and not self._fired:
+            self._fired = True
+            self._on_first_audio(time.perf_counter())
+        return data
+
+    def is_opus(self) -> bool:
+        return self.source.is_opus()
+
+    def cleanup(self) -> None:
+        self.source.cleanup()
+
+
+class PrimedSource(discord.AudioSource):
+    """Wraps an AudioSource whose first frames can be read ahead of playback.
+
+    prime() runs in a worker thread while another track is still playing, so
+    FFmpeg has started up and produced audio by the time the player asks for it.
+    """
+
+    def __init__(self, source: discord.AudioSource):
+        self.source = source
+        self._buffer: deque = deque()
+
+    def prime(self, frames: int = 25) -> int:
+        while len(self._buffer) < frames:
+            data = self.source.read()
+            if not data:
+                break
+            self._buffer.append(data)
+        return len(self._buffer)
+
+    def read(self) -> bytes:
+        if self._buffer:
+            return self._buffer.popleft()
+        return self.source.read()
+
+    def is_opus(self) -> bool:
+        return self.source.is_opus()
+
+    def cleanup(self) -> None:
+        self._buffer.clear()
+        self.source.cleanup()
+
+
+class PlaybackStats:
+    """Recent timing samples (time to first audio, gaps between tracks), grouped by mode."""
+
+    def __init__(self, maxlen: int = 200):
+        self._samples: Dict[str, deque] = {}
+        self._maxlen = maxlen
+
+    def record(self, mode: str, seconds: float) -> None:
+        self._samples.setdefault(mode, deque(maxlen=self._maxlen)).append(seconds)
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        result = {}
+        for mode, samples in self._samples.items():
+            values = sorted(samples)
+            if not values:
+                continue
+            result[mode] = {
+                "count": len(values),
+                "median_s": statistics.median(values),
+                "p95_s": values[min(len(values) - 1, int(len(values) * 0.95))],
+            }
+        return result
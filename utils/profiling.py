@@ -0,0 +1,124 @@
+import asyncio
+import cProfile
+import io
+import logging
+import pstats
+import time
+import tracemalloc
+from pathlib import Path
+from typing import List, Tuple
+
+logger = logging.getLogger("newBaldy.profiling")
+
+MAX_SECONDS = 120
+
+# One profile at a time: cProfile can't nest and overlapping tracemalloc windows would mix.
+_lock = asyncio.Lock()
+
+
+def is_running() -> bool:
+    return _lock.locked()
+
+
+def _report_path(folder: Path, kind: str, suffix: str) -> Path:
+    folder.mkdir(parents=True, exist_ok=True)
+    return folder / f"{kind}-{time.strftime('%Y%m%d-%H%M%S')}{suffix}"
+
+
+def _short(filename: str) -> str:
+    parts = Path(filename).parts
+    return "/".join(parts[-2:]) if len(parts) > 1 else filename
+
+
+async def profile_cpu(seconds: float, folder: Path, top: int = 15) -> Tuple[List[str], Path]:
+    """Profile the event loop thread with cProfile for seconds.
+
+    Returns the top functions by own time and the path of the text report; the
+    raw stats are written next to it as .prof for snakeviz or pstats. Work in
+    executor threads (yt_dlp, scans) shows up only as the loop waiting on it.
+    """
+    async with _lock:
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            profiler.disable()
+    return await asyncio.to_thread(_write_cpu_report, profiler, seconds, folder, top)
+
+
+def _write_cpu_report(profiler: cProfile.Profile, seconds: float, folder: Path, top: int) -> Tuple[List[str], Path]:
+    report = _report_path(folder, "cpu", ".txt")
+    profiler.dump_stats(str(report.with_suffix(".prof")))
+    stream = io.StringIO()
+    stats = pstats.Stats(profiler, stream=stream)
+    stream.write(f"CPU profile of the event loop thread over {seconds:.0f}s\n\n")
+    stats.sort_stats(pstats.SortKey.TIME).print_stats(100)
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(100)
+    report.write_text(stream.getvalue(), encoding="utf-8")
+
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][2], reverse=True)[:top]
+    lines = [
+        f"{tt:7.3f}s {ct:7.3f}s {nc:>7} {_short(filename)}:{line}({func})"
+        for (filename, line, func), (_, nc, tt, ct, _) in rows
+    ]
+    return ["    own     cum   calls function"] + lines, report
+
+
+async def profile_memory(seconds: float, folder: Path, top: int = 15, frames: int = 10) -> Tuple[List[str], Path]:
+    """Diff two tracemalloc snapshots taken seconds apart.
+
+    Tracing only runs for the window, so allocations made before it are not
+    attributed; growth during the window is. Returns the lines that grew most
+    and the path of the full report.
+    """
+    async with _lock:
+        started_here = not tracemalloc.is_tracing()
+        if started_here:
+            tracemalloc.start(frames)
+        try:
+            before = tracemalloc.take_snapshot()
+            await asyncio.sleep(seconds)
+            after = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+        finally:
+            if started_here:
+                tracemalloc.stop()
+    return await asyncio.to_thread(_write_memory_report, before, after, current, peak, seconds, folder, top)
+
+
+def _write_memory_report(
+    before: tracemalloc.Snapshot,
+    after: tracemalloc.Snapshot,
+    current: int,
+    peak: int,
+    seconds: float,
+    folder: Path,
+    top: int,
+) -> Tuple[List[str], Path]:
+    ignore = [
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        tracemalloc.Filter(False, "<unknown>"),
+    ]
+    before, after = before.filter_traces(ignore), after.filter_traces(ignore)
+    diff = after.compare_to(before, "lineno")
+
+    report = _report_path(folder, "mem", ".txt")
+    with report.open("w", encoding="utf-8") as f:
+        f.write(f"tracemalloc diff over {seconds:.0f}s, traced now {current / 1024:.0f} KiB, peak {peak / 1024:.0f} KiB\n\n")
+        f.write("Growth by line:\n")
+        for stat in diff[:200]:
+            f.write(f"{stat}\n")
+        f.write("\nLargest live allocations by traceback:\n")
+        for stat in after.statistics("traceback")[:25]:
+            f.write(f"\n{stat}\n")
+            f.writelines(f"    {line}\n" for line in stat.traceback.format())
+
+    lines = [f"traced {current / 1024:.0f} KiB, peak {peak / 1024:.0f} KiB"]
+    for stat in diff[:top]:
+        frame = stat.traceback[0]
+        lines.append(
+            f"{stat.size_diff / 1024:+9.1f} KiB {stat.count_diff:+7} {_short(frame.filename)}:{frame.lineno}"
+        )
+    return lines, report
@@ -0,0 +1,248 @@
+import asyncio
+import contextvars
+import itertools
+import logging
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Any
+
+import discord
+
+from utils import tracing
+from utils.downloader import (
+    download_error_message,
+    fetch_and_index,
+    get_song_file_path,
+    video_id_from_url,
+)
+from utils.guild_state import SongQueue
+from utils.metrics import DOWNLOAD_LATENCY, executor_usage
+
+logger = logging.getLogger("newBaldy.scheduler")
+
+# Lower runs first.
+PRIORITY_NOW = 0        # a guild is about to play this song
+PRIORITY_REQUEST = 1    # interactive !play
+PRIORITY_PREFETCH = 2   # background prefetch of queued songs
+
+
+def log_background_result(future: asyncio.Future) -> None:
+    """Done-callback for downloads and tasks nobody awaits, so failures still get logged."""
+    if future.cancelled():
+        return
+    if future.exception() is not None:
+        logger.warning("Background task failed: %r", future.exception())
+    elif isinstance(future.result(), dict) and "error" in future.result():
+        logger.info("Background download skipped: %s", download_error_message(future.result()))
+
+
+class _Job:
+    __slots__ = ("key", "url", "info", "priority", "enqueued_at", "started", "future", "span")
+
+    def __init__(self, key: str, url: str, info: Optional[Dict[str, Any]], priority: int, future: asyncio.Future):
+        self.key = key
+        self.url = url
+        self.info = info
+        self.priority = priority
+        self.enqueued_at = time.monotonic()
+        self.started = False
+        self.future = future
+        # Span of the request that submitted it; the worker runs outside that request's context.
+        self.span = tracing.current_span()
+
+
+class DownloadScheduler:
+    """Runs downloads on a fixed pool of workers in priority order.
+
+    Each video is downloaded at most once at a time: submitting a video that
+    is already queued or running returns the existing future (bumping its
+    priority if the new request is more urgent), so every caller gets the
+    same result or error.
+    """
+
+    def __init__(
+        self,
+        download_folder_path: Path,
+        max_song_time: int,
+        library_path: Path,
+        download_folder: str,
+        workers: int = 2,
+        prefetch_depth: int = 3,
+    ):
+        self.download_folder_path = download_folder_path
+        self.max_song_time = max_song_time
+        self.library_path = library_path
+        self.download_folder = download_folder
+        self.workers = max(1, workers)
+        self.prefetch_depth = prefetch_depth
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._tasks: List[asyncio.Task] = []
+        self._jobs: Dict[str, _Job] = {}
+        self._seq = itertools.count()
+        self._running = 0
+        self._completed = 0
+        self._failed = 0
+        self._waits: deque = deque(maxlen=200)
+        self._listeners: List[Callable[[str, str], None]] = []
+
+    def add_listener(self, callback: Callable[[str, str], None]) -> None:
+        """Call callback(video_id, file_path) on the loop after each successful download."""
+        self._listeners.append(callback)
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._queue = asyncio.PriorityQueue()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="download")
+        # A fresh context, so workers don't inherit the span of whichever request started them.
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"download-worker-{i}", context=contextvars.Context())
+            for i in range(self.workers)
+        ]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for job in self._jobs.values():
+            if not job.future.done():
+                job.future.cancel()
+        self._jobs.clear()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def submit(
+        self,
+        url: str,
+        video_id: Optional[str] = None,
+        priority: int = PRIORITY_REQUEST,
+        info: Optional[Dict[str, Any]] = None,
+    ) -> asyncio.Future:
+        """Queue a download and return a future resolving to {"file": ...} or an error dict.
+
+        info is an already resolved yt_dlp info dict, downloaded without re-extracting.
+        """
+        if self._queue is None:
+            self.start()
+        key = video_id or video_id_from_url(url) or url
+        job = self._jobs.get(key)
+        if job is not None:
+            if job.span is None:
+                job.span = tracing.current_span()
+            if not job.started and priority < job.priority:
+                job.priority = priority
+                self._queue.put_nowait((priority, next(self._seq), job))
+            return job.future
+
+        job = _Job(key, url, info, priority, asyncio.get_running_loop().create_future())
+        self._jobs[key] = job
+        self._queue.put_nowait((priority, next(self._seq), job))
+        return job.future
+
+    def resolved_info(self, video_id: str) -> Optional[Dict[str, Any]]:
+        """Return the resolved info of a queued or running download, if it has one."""
+        job = self._jobs.get(video_id)
+        return job.info if job is not None else None
+
+    async def download(
+        self,
+        url: str,
+        destination: Optional[discord.abc.Messageable],
+        video_id: Optional[str] = None,
+        priority: int = PRIORITY_REQUEST,
+    ) -> Optional[str]:
+        """Download a song and return its path, reporting failures to destination."""
+        future = self.submit(url, video_id, priority)
+        try:
+            result = await asyncio.shield(future)
+        except Exception as e:
+            logger.exception("Download failed for %s: %s", url, e)
+            if destination:
+                await destination.send(f"Download error: {e}")
+            return None
+
+        if "error" in result:
+            if destination:
+                await destination.send(download_error_message(result))
+            return None
+        return result["file"]
+
+    def prefetch(self, songs: SongQueue) -> int:
+        """Start background downloads for the next prefetch_depth songs missing on disk.
+
+        The first song is about to play, so it gets PRIORITY_NOW.
+        """
+        scheduled = 0
+        with tracing.detached():
+            for position, song in enumerate(songs.head(self.prefetch_depth)):
+                if get_song_file_path(song.id, self.download_folder_path):
+                    continue
+                priority = PRIORITY_NOW if position == 0 else PRIORITY_PREFETCH
+                self.submit(song.url, song.id, priority).add_done_callback(log_background_result)
+                scheduled += 1
+        return scheduled
+
+    def stats(self) -> Dict[str, Any]:
+        waits = list(self._waits)
+        return {
+            "workers": self.workers,
+            "queued": sum(1 for job in self._jobs.values() if not job.started),
+            "running": self._running,
+            "completed": self._completed,
+            "failed": self._failed,
+            "avg_wait_s": sum(waits) / len(waits) if waits else 0.0,
+            "max_wait_s": max(waits) if waits else 0.0,
+            "executor": executor_usage(self._executor),
+        }
+
+    async def _worker(self) -> None:
+        while True:
+            _, _, job = await self._queue.get()
+            if job.started or job.future.done():
+                continue
+            job.started = True
+            self._waits.append(time.monotonic() - job.enqueued_at)
+            self._running += 1
+            started = time.perf_counter()
+            outcome = "error"
+            try:
+                with tracing.span("download", parent=job.span, song=job.key, priority=job.priority):
+                    result = await fetch_and_index(
+                        job.url,
+                        self.download_folder_path,
+                        self.max_song_time,
+                        self.library_path,
+                        self.download_folder,
+                        self._executor,
+                        job.info,
+                    )
+                if "error" in result:
+                    self._failed += 1
+                else:
+                    self._completed += 1
+                    outcome = "ok"
+                    for callback in self._listeners:
+                        try:
+                            callback(result["id"], result["file"])
+                        except Exception:
+                            logger.exception("Download listener failed for %s", result["id"])
+                if not job.future.done():
+                    job.future.set_result(result)
+            except asyncio.CancelledError:
+                outcome = "cancelled"
+                if not job.future.done():
+                    job.future.cancel()
+                raise
+            except Exception as e:
+                self._failed += 1
+                if not job.future.done():
+                    job.future.set_exception(e)
+            finally:
+                DOWNLOAD_LATENCY.observe(time.perf_counter() - started, outcome=outcome)
+                self._running -= 1
+                self._jobs.pop(job.key, None)
@@ -0,0 +1,98 @@
+import json
+import logging
+import os
+import tempfile
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger("newBaldy.search_cache")
+
+
+class SearchCache:
+    """TTL + LRU cache of YouTube search results keyed by normalized query.
+
+    Entries expire ttl seconds after they were stored; once max_entries is
+    reached the least recently used entry is dropped. With a path the cache
+    can be saved and loaded so a restart starts warm. get() and put() copy
+    the result list and each (flat) result dict, so callers may modify what
+    they get back.
+    """
+
+    def __init__(self, ttl: int = 21600, max_entries: int = 1000, path: Optional[Path] = None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._dirty = False
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        return " ".join(query.lower().split())
+
+    def get(self, query: str) -> Optional[List[Dict[str, Any]]]:
+        key = self.normalize(query)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > time.time():
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return [dict(result) for result in entry[1]]
+        if entry is not None:
+            del self._entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, query: str, results: List[Dict[str, Any]]) -> None:
+        if self.ttl <= 0 or self.max_entries <= 0:
+            return
+        key = self.normalize(query)
+        self._entries[key] = (time.time() + self.ttl, [dict(result) for result in results])
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        self._dirty = True
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def load(self) -> None:
+        if self.path is None or not self.path.exists():
+            return
+        try:
+            with self.path.open("r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (json.JSONDecodeError, OSError) as e:
+            logger.warning("Ignoring unreadable search cache %s: %s", self.path, e)
+            return
+        now = time.time()
+        for key, (expires_at, results) in data.items():
+            if expires_at > now:
+                self._entries[key] = (expires_at, results)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        logger.info("Loaded %d cached searches from %s", len(self._entries), self.path)
+
+    def save(self) -> None:
+        if self.path is None or not self._dirty:
+            return
+        now = time.time()
+        data = {k: list(v) for k, v in self._entries.items() if v[0] > now}
+        try:
+            with tempfile.NamedTemporaryFile(
+                "w", delete=False, dir=str(self.path.parent), encoding="utf-8"
+            ) as tf:
+                json.dump(data, tf, ensure_ascii=False)
+                tempname = tf.name
+            os.replace(tempname, str(self.path))
+            self._dirty = False
+        except Exception:
+            logger.exception("Failed to write search cache")
@@ -0,0 +1,194 @@
+import asyncio
+import logging
+import statistics
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from utils import tracing
+from utils.downloader import api_search_sync, ytsearch_sync
+from utils.metrics import SEARCH_LATENCY
+from utils.search_cache import SearchCache
+
+logger = logging.getLogger("newBaldy.search_race")
+
+SEARCH_MODES = ("sequential", "race", "hedge")
+PROVIDER_API = "api"
+PROVIDER_YTSEARCH = "ytsearch"
+
+# Hedge delay bounds once it adapts to measured API latency.
+_MIN_HEDGE_DELAY = 0.1
+_MIN_SAMPLES = 10
+
+
+class ProviderStats:
+    """Latency and outcome counters for one search provider.
+
+    Latencies are recorded when the provider's thread finishes, even if the
+    race was already decided, so slow answers still count.
+    """
+
+    def __init__(self, window: int = 200):
+        self._lock = threading.Lock()
+        self._latencies: deque = deque(maxlen=window)
+        self.calls = 0
+        self.results = 0
+        self.empty = 0
+        self.wins = 0
+
+    def record(self, seconds: float, found: bool) -> None:
+        with self._lock:
+            self.calls += 1
+            self._latencies.append(seconds)
+            if found:
+                self.results += 1
+            else:
+                self.empty += 1
+
+    def percentile(self, q: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._latencies)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            samples = list(self._latencies)
+            calls, results, wins = self.calls, self.results, self.wins
+        return {
+            "calls": calls,
+            "wins": wins,
+            "success_rate": results / calls if calls else 0.0,
+            "median_s": statistics.median(samples) if samples else 0.0,
+            "p90_s": self.percentile(0.9) or 0.0,
+        }
+
+
+class SearchRacer:
+    """Finds a video for a query with the YouTube API and yt_dlp ytsearch.
+
+    sequential: API first, ytsearch only if it found nothing (the old behaviour).
+    race:       both at once, first non-empty answer wins.
+    hedge:      API first, ytsearch joins after hedge_delay seconds, or right
+                away if the API comes back empty. Once enough API latencies
+                are known the delay follows their p90, capped at twice the
+                configured value.
+    The losing provider's task is cancelled; its worker thread can't be
+    interrupted and simply finishes in the background.
+    """
+
+    def __init__(
+        self,
+        youtube_api_key: str,
+        mode: str = "sequential",
+        hedge_delay: float = 1.5,
+        cache: Optional[SearchCache] = None,
+    ):
+        self.mode = mode
+        self.configured_delay = hedge_delay
+        self.cache = cache
+        self.providers: Dict[str, Callable[[str], List[Dict[str, Any]]]] = {
+            PROVIDER_API: lambda q: api_search_sync(q, youtube_api_key),
+            PROVIDER_YTSEARCH: ytsearch_sync,
+        }
+        self.provider_stats = {name: ProviderStats() for name in self.providers}
+
+    @property
+    def hedge_delay(self) -> float:
+        api = self.provider_stats[PROVIDER_API]
+        if api.calls < _MIN_SAMPLES:
+            return self.configured_delay
+        p90 = api.percentile(0.9) or self.configured_delay
+        return max(_MIN_HEDGE_DELAY, min(p90, self.configured_delay * 2))
+
+    def _timed(self, name: str, query: str) -> List[Dict[str, Any]]:
+        started = time.perf_counter()
+        results: List[Dict[str, Any]] = []
+        try:
+            with tracing.span(f"search_{name}") as span:
+                results = self.providers[name](query)
+                if span is not None:
+                    span.attrs["results"] = len(results)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.provider_stats[name].record(elapsed, bool(results))
+            SEARCH_LATENCY.observe(elapsed, provider=name, found="yes" if results else "no")
+        return results
+
+    def _start(self, name: str, query: str) -> asyncio.Task:
+        return asyncio.create_task(asyncio.to_thread(self._timed, name, query), name=f"search-{name}")
+
+    async def search(self, query: str) -> Tuple[Optional[str], List[Dict[str, Any]]]:
+        """Return (provider, results); provider is "cache" for cache hits and None if nothing was found."""
+        with tracing.span("search", query=query, mode=self.mode) as span:
+            provider, results = await self._search(query)
+            if span is not None:
+                span.attrs["provider"] = provider
+        return provider, results
+
+    async def _search(self, query: str) -> Tuple[Optional[str], List[Dict[str, Any]]]:
+        if self.cache is not None:
+            cached = self.cache.get(query)
+            if cached is not None:
+                return "cache", cached
+
+        if self.mode == "race":
+            order = [(PROVIDER_API, 0.0), (PROVIDER_YTSEARCH, 0.0)]
+        elif self.mode == "hedge":
+            order = [(PROVIDER_API, 0.0), (PROVIDER_YTSEARCH, self.hedge_delay)]
+        else:
+            order = [(PROVIDER_API, 0.0), (PROVIDER_YTSEARCH, None)]
+        provider, results = await self._first_result(query, order)
+
+        if provider is not None:
+            self.provider_stats[provider].wins += 1
+            if self.cache is not None:
+                self.cache.put(query, results)
+        return provider, results
+
+    async def _first_result(
+        self, query: str, order: List[Tuple[str, Optional[float]]]
+    ) -> Tuple[Optional[str], List[Dict[str, Any]]]:
+        # delay None: start only once everything before it has come back empty.
+        running: Dict[asyncio.Task, str] = {}
+        pending = list(order)
+        started_at = time.perf_counter()
+        try:
+            while pending or running:
+                while pending and pending[0][1] is not None and pending[0][1] <= time.perf_counter() - started_at:
+                    name, _ = pending.pop(0)
+                    running[self._start(name, query)] = name
+                if not running:
+                    # Everything in flight came back empty: start the next provider now.
+                    name, _ = pending.pop(0)
+                    running[self._start(name, query)] = name
+                    continue
+                timeout = None
+                if pending and pending[0][1] is not None:
+                    timeout = max(0.0, pending[0][1] - (time.perf_counter() - started_at))
+                done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    name = running.pop(task)
+                    try:
+                        results = task.result()
+                    except Exception:
+                        logger.exception("Search provider %s failed for '%s'", name, query)
+                        results = []
+                    if results:
+                        return name, results
+                if done and not running and pending:
+                    # Whatever was waiting for a delay can start immediately.
+                    pending[0] = (pending[0][0], 0.0)
+            return None, []
+        finally:
+            for task in running:
+                task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "hedge_delay_s": self.hedge_delay,
+            "providers": {name: s.summary() for name, s in self.provider_stats.items()},
+        }
@@ -0,0 +1,210 @@
+import contextvars
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger("newBaldy.tracing")
+
+# The span code is currently running in; asyncio tasks and asyncio.to_thread copy it.
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("trace_span", default=None)
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start", "end", "wall_start", "attrs")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], attrs: Dict[str, Any]):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.start = time.perf_counter()
+        self.wall_start = time.time()
+        self.end: Optional[float] = None
+        self.attrs = attrs
+
+    @property
+    def duration(self) -> float:
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.wall_start,
+            "duration_s": self.duration,
+            "attrs": self.attrs,
+        }
+
+
+class Tracer:
+    """Keeps the spans of recent traces in memory and appends every finished span to a JSONL file.
+
+    finish() only buffers the span; a background thread writes the buffer
+    every flush_interval seconds, so neither the event loop nor the audio
+    player thread ever touches the file.
+    """
+
+    def __init__(
+        self,
+        path: Optional[Path] = None,
+        max_traces: int = 200,
+        max_bytes: int = 10 << 20,
+        flush_interval: float = 2.0,
+    ):
+        self.path = path
+        self.max_traces = max_traces
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+        self._traces: "OrderedDict[str, List[Span]]" = OrderedDict()
+        self._pending: List[Span] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+
+    def configure(self, path: Optional[Path]) -> None:
+        self.path = path
+        if path is not None and self._flusher is None:
+            self._stop.clear()
+            self._flusher = threading.Thread(target=self._flush_periodically, name="trace-export", daemon=True)
+            self._flusher.start()
+
+    def close(self) -> None:
+        """Stop the export thread after a last flush."""
+        if self._flusher is not None:
+            self._stop.set()
+            self._flusher.join()
+            self._flusher = None
+
+    def finish(self, span: Span) -> None:
+        with self._lock:
+            spans = self._traces.get(span.trace_id)
+            if spans is None:
+                spans = self._traces[span.trace_id] = []
+                while len(self._traces) > self.max_traces:
+                    self._traces.popitem(last=False)
+            spans.append(span)
+            if self.path is not None:
+                self._pending.append(span)
+
+    def _flush_periodically(self) -> None:
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+        self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending or self.path is None:
+            return
+        data = "".join(json.dumps(span.to_dict(), ensure_ascii=False, default=str) + "\n" for span in pending)
+        try:
+            if self.path.exists() and self.path.stat().st_size > self.max_bytes:
+                os.replace(self.path, self.path.with_suffix(self.path.suffix + ".1"))
+            with self.path.open("a", encoding="utf-8") as f:
+                f.write(data)
+        except OSError:
+            logger.exception("Failed to export %d spans", len(pending))
+
+    def traces(self) -> List[Dict[str, Any]]:
+        """Recent traces with their root span, total duration and spans ordered by start."""
+        with self._lock:
+            items = [(trace_id, list(spans)) for trace_id, spans in self._traces.items()]
+        result = []
+        for trace_id, spans in items:
+            root = next((s for s in spans if s.parent_id is None), None)
+            if root is None:
+                continue
+            spans.sort(key=lambda s: s.start)
+            result.append({
+                "trace_id": trace_id,
+                "name": root.name,
+                "attrs": root.attrs,
+                "duration_s": max(s.start + s.duration for s in spans) - root.start,
+                "spans": spans,
+                "root": root,
+            })
+        return result
+
+    def slowest(self, count: int = 5) -> List[Dict[str, Any]]:
+        return sorted(self.traces(), key=lambda t: t["duration_s"], reverse=True)[:count]
+
+
+tracer = Tracer()
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+@contextmanager
+def _run(span: Span) -> Iterator[Span]:
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.attrs["error"] = type(e).__name__
+        raise
+    finally:
+        span.end = time.perf_counter()
+        _current_span.reset(token)
+        tracer.finish(span)
+
+
+@contextmanager
+def detached() -> Iterator[None]:
+    """Run background work started from inside a trace without attaching it to that trace."""
+    token = _current_span.set(None)
+    try:
+        yield
+    finally:
+        _current_span.reset(token)
+
+
+@contextmanager
+def trace(name: str, **attrs: Any) -> Iterator[Span]:
+    """Start a new trace with a root span."""
+    with _run(Span(name, f"{random.getrandbits(64):016x}", None, attrs)) as span:
+        yield span
+
+
+@contextmanager
+def span(name: str, parent: Optional[Span] = None, **attrs: Any) -> Iterator[Optional[Span]]:
+    """Child span of parent or the current span; does nothing outside a trace."""
+    parent = parent or _current_span.get()
+    if parent is None:
+        yield None
+        return
+    with _run(Span(name, parent.trace_id, parent.span_id, attrs)) as child:
+        yield child
+
+
+def record_span(name: str, parent: Optional[Span], start: float, end: float, **attrs: Any) -> None:
+    """Add an already measured perf_counter() interval, e.g. from the audio player thread."""
+    if parent is None:
+        return
+    child = Span(name, parent.trace_id, parent.span_id, attrs)
+    child.wall_start -= child.start - start
+    child.start, child.end = start, end
+    tracer.finish(child)
+
+
+def format_trace(summary: Dict[str, Any]) -> str:
+    """One line per span, indented under its parent, with offset and duration."""
+    spans = summary["spans"]
+    depth = {summary["root"].span_id: 0}
+    lines = []
+    for s in spans:
+        level = depth.get(s.parent_id, -1) + 1 if s.parent_id else 0
+        depth[s.span_id] = level
+        offset = s.start - summary["root"].start
+        lines.append(f"{'  ' * level}{s.name} +{offset:.2f}s {s.duration:.2f}s")
+    return "\n".join(lines)
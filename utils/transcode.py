@@ -0,0 +1,119 @@
+import asyncio
+import logging
+import os
+from pathlib import Path
+from typing import Dict, Optional
+
+from utils.library import get_library_store
+
+logger = logging.getLogger("newBaldy.transcode")
+
+NORMALIZED_FOLDER = "normalized"
+
+
+class Transcoder:
+    """Converts downloads once into loudness-normalized 48 kHz Ogg Opus files.
+
+    Output goes to <download folder>/normalized/<id>.ogg and is recorded as
+    "normalized" in the song's library record. At most `workers` FFmpeg
+    processes run at a time; workers=0 disables the pipeline.
+    """
+
+    def __init__(
+        self,
+        download_folder_path: Path,
+        library_path: Path,
+        download_folder: str,
+        workers: int = 0,
+        bitrate: str = "128k",
+    ):
+        self.download_folder_path = download_folder_path
+        self.library_path = library_path
+        self.download_folder = download_folder
+        self.workers = workers
+        self.bitrate = bitrate
+        self.output_folder = download_folder_path / NORMALIZED_FOLDER
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self.completed = 0
+        self.failed = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.workers > 0
+
+    def normalized_path(self, video_id: str) -> Path:
+        return self.output_folder / f"{video_id}.ogg"
+
+    def playable_path(self, video_id: str, song_file: Optional[str]) -> Optional[str]:
+        """Prefer the normalized file if the library says there is one and it still exists."""
+        record = get_library_store(self.library_path).get(video_id)
+        if record and record.get("normalized"):
+            path = self.normalized_path(video_id)
+            if path.exists():
+                return str(path)
+        return song_file
+
+    def submit(self, video_id: str, source_path: str) -> Optional[asyncio.Task]:
+        if not self.enabled:
+            return None
+        task = self._tasks.get(video_id)
+        if task is None:
+            if self._semaphore is None:
+                self._semaphore = asyncio.Semaphore(self.workers)
+            task = asyncio.create_task(self._transcode(video_id, source_path), name=f"transcode-{video_id}")
+            self._tasks[video_id] = task
+            task.add_done_callback(lambda _t, k=video_id: self._tasks.pop(k, None))
+        return task
+
+    async def stop(self) -> None:
+        for task in list(self._tasks.values()):
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+
+    async def _transcode(self, video_id: str, source_path: str) -> None:
+        async with self._semaphore:
+            self.output_folder.mkdir(parents=True, exist_ok=True)
+            target = self.normalized_path(video_id)
+            tmp = target.with_suffix(".tmp.ogg")
+            try:
+                proc = await asyncio.create_subprocess_exec(
+                    "ffmpeg", "-nostdin", "-hide_banner", "-loglevel", "error", "-y",
+                    "-i", source_path, "-vn",
+                    "-af", "loudnorm=I=-16:TP=-1.5:LRA=11",
+                    "-ar", "48000", "-ac", "2",
+                    "-c:a", "libopus", "-b:a", self.bitrate,
+                    str(tmp),
+                    stdout=asyncio.subprocess.DEVNULL,
+                    stderr=asyncio.subprocess.PIPE,
+                )
+            except OSError as e:
+                self.failed += 1
+                logger.error("Could not start ffmpeg to normalize %s: %s", video_id, e)
+                return
+            try:
+                _, stderr = await proc.communicate()
+            except asyncio.CancelledError:
+                proc.kill()
+                await proc.wait()
+                tmp.unlink(missing_ok=True)
+                raise
+
+        if proc.returncode != 0:
+            self.failed += 1
+            tmp.unlink(missing_ok=True)
+            logger.warning(
+                "Normalizing %s failed (exit %s): %s",
+                video_id, proc.returncode, stderr.decode(errors="replace").strip()[-500:],
+            )
+            return
+
+        os.replace(tmp, target)
+        store = get_library_store(self.library_path)
+        record = store.get(video_id)
+        if record is not None:
+            record = dict(record)
+            record["normalized"] = str(Path(self.download_folder) / NORMALIZED_FOLDER / target.name)
+            await asyncio.to_thread(store.put, video_id, record)
+        self.completed += 1
+        logger.info("Normalized %s to %s", video_id, target)
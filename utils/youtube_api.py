@@ -0,0 +1,179 @@
+import contextvars
+import datetime
+import json
+import logging
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+import httplib2
+from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
+
+logger = logging.getLogger("newBaldy.youtube_api")
+
+# Units charged per call, see https://developers.google.com/youtube/v3/determine_quota_cost
+QUOTA_COSTS = {"search.list": 100, "videos.list": 1}
+
+# Which command is spending quota; asyncio.to_thread copies it into worker threads.
+quota_label: contextvars.ContextVar[str] = contextvars.ContextVar("quota_label", default="other")
+
+try:
+    from zoneinfo import ZoneInfo
+    _QUOTA_TZ = ZoneInfo("America/Los_Angeles")
+except Exception:
+    # No tz database (e.g. slim images): Pacific standard time is close enough.
+    _QUOTA_TZ = datetime.timezone(datetime.timedelta(hours=-8))
+
+
+class QuotaExceeded(Exception):
+    pass
+
+
+def _quota_day() -> str:
+    # The daily quota resets at midnight Pacific time.
+    return datetime.datetime.now(_QUOTA_TZ).date().isoformat()
+
+
+class QuotaLedger:
+    """Local accounting of YouTube Data API units spent today, per command."""
+
+    def __init__(self, daily_limit: int = 10000, path: Optional[Path] = None):
+        self.daily_limit = daily_limit
+        self.path = path
+        self._lock = threading.Lock()
+        self._day = _quota_day()
+        self._spent = 0
+        self._by_command: Dict[str, int] = {}
+        self._load()
+
+    def _load(self) -> None:
+        if self.path is None or not self.path.exists():
+            return
+        try:
+            with self.path.open("r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (json.JSONDecodeError, OSError) as e:
+            logger.warning("Ignoring unreadable quota ledger %s: %s", self.path, e)
+            return
+        if data.get("day") == self._day:
+            self._spent = data.get("spent", 0)
+            self._by_command = data.get("by_command", {})
+
+    def _save(self) -> None:
+        if self.path is None:
+            return
+        try:
+            with tempfile.NamedTemporaryFile(
+                "w", delete=False, dir=str(self.path.parent), encoding="utf-8"
+            ) as tf:
+                json.dump({"day": self._day, "spent": self._spent, "by_command": self._by_command}, tf)
+                tempname = tf.name
+            os.replace(tempname, str(self.path))
+        except Exception:
+            logger.exception("Failed to write quota ledger")
+
+    def _roll_over(self) -> None:
+        day = _quota_day()
+        if day != self._day:
+            self._day, self._spent, self._by_command = day, 0, {}
+
+    def charge(self, method: str, label: str, calls: int = 1) -> None:
+        """Record the cost of calls to method, or raise QuotaExceeded if it would go over the limit."""
+        cost = QUOTA_COSTS.get(method, 1) * calls
+        with self._lock:
+            self._roll_over()
+            if self._spent + cost > self.daily_limit:
+                raise QuotaExceeded(
+                    f"{method} needs {cost} units, {self.daily_limit - self._spent} left today"
+                )
+            self._spent += cost
+            self._by_command[label] = self._by_command.get(label, 0) + cost
+            self._save()
+
+    def exhaust(self) -> None:
+        """The API reported the quota as used up; stop calling it until the reset."""
+        with self._lock:
+            self._roll_over()
+            self._spent = max(self._spent, self.daily_limit)
+            self._save()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._roll_over()
+            return {
+                "day": self._day,
+                "spent": self._spent,
+                "remaining": max(0, self.daily_limit - self._spent),
+                "limit": self.daily_limit,
+                "by_command": dict(self._by_command),
+            }
+
+
+def _is_quota_error(error: HttpError) -> bool:
+    return error.resp.status == 403 and b"quotaExceeded" in (error.content or b"")
+
+
+class YouTubeClient:
+    """Long-lived YouTube Data API v3 client shared by every thread.
+
+    The service is built once from the discovery document bundled with
+    google-api-python-client. httplib2 connections aren't thread-safe, so
+    each thread keeps its own keep-alive Http object and reuses it.
+    """
+
+    def __init__(self, api_key: str, ledger: Optional[QuotaLedger] = None, timeout: float = 10):
+        self.ledger = ledger or QuotaLedger()
+        self.timeout = timeout
+        self._service = build(
+            "youtube", "v3",
+            developerKey=api_key,
+            static_discovery=True,
+            cache_discovery=False,
+        )
+        self._local = threading.local()
+
+    def _http(self) -> httplib2.Http:
+        http = getattr(self._local, "http", None)
+        if http is None:
+            http = httplib2.Http(timeout=self.timeout)
+            self._local.http = http
+        return http
+
+    def execute(self, request, method: str, label: Optional[str] = None) -> Dict[str, Any]:
+        self.ledger.charge(method, label or quota_label.get())
+        try:
+            return request.execute(http=self._http())
+        except HttpError as e:
+            if _is_quota_error(e):
+                self.ledger.exhaust()
+            raise
+
+    def search(self, query: str, max_results: int = 1, label: Optional[str] = None) -> List[Dict[str, Any]]:
+        request = self._service.search().list(q=query, part="snippet", maxResults=max_results, type="video")
+        return self.execute(request, "search.list", label).get("items", [])
+
+    def videos(self, video_ids: List[str], label: Optional[str] = None) -> List[Dict[str, Any]]:
+        # No maxResults: videos.list doesn't accept it together with id.
+        request = self._service.videos().list(id=",".join(video_ids), part="snippet,contentDetails")
+        return self.execute(request, "videos.list", label).get("items", [])
+
+
+_clients: Dict[str, YouTubeClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_youtube_client(api_key: str, ledger: Optional[QuotaLedger] = None) -> YouTubeClient:
+    """Return the shared client for api_key, creating it on first use.
+
+    ledger only matters for the first call; the bot creates the client with
+    a persisted ledger at startup and everything else reuses it.
+    """
+    with _clients_lock:
+        client = _clients.get(api_key)
+        if client is None:
+            client = YouTubeClient(api_key, ledger)
+            _clients[api_key] = client
+        return client